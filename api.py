@@ -1,256 +1,360 @@
-"""FastAPI Web Server - DOCX Downloads WORKING"""
-
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse
-from fastapi.staticfiles import StaticFiles
-import os
-import uuid
-from services.document_formatter import DocxFormatter
-import logging
-
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-app = FastAPI(title="OCR Technologies - PRODUCTION")
-
-# Mount static folder
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-formatter = DocxFormatter()
-
-# Store generated files with absolute paths
-generated_files = {}
-
-@app.get("/", response_class=HTMLResponse)
-async def home():
-    """Beautiful landing page"""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>🚀 OCR Technologies - Bakeer Academy</title>
-        <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body { 
-                font-family: 'Segoe UI', Arial; 
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                padding: 20px;
-            }
-            .container { 
-                background: white; 
-                padding: 50px; 
-                border-radius: 20px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                max-width: 900px;
-                width: 100%;
-            }
-            h1 { 
-                color: #1f4e79; 
-                margin-bottom: 10px; 
-                font-size: 2.5em;
-                text-align: center;
-            }
-            .tagline { 
-                color: #666; 
-                text-align: center; 
-                margin-bottom: 30px;
-                font-size: 1.1em;
-            }
-            .upload-box {
-                border: 3px dashed #667eea;
-                padding: 60px 20px;
-                border-radius: 15px;
-                text-align: center;
-                cursor: pointer;
-                transition: all 0.3s;
-                background: #f8f9ff;
-            }
-            .upload-box:hover {
-                background: #f0f2ff;
-                border-color: #764ba2;
-            }
-            .upload-box h2 { color: #667eea; margin-bottom: 10px; }
-            input[type="file"] { display: none; }
-            #result { 
-                margin-top: 30px; 
-                display: none;
-                padding: 30px;
-                border-radius: 15px;
-                text-align: center;
-            }
-            .success { 
-                background: #d4edda; 
-                border: 2px solid #28a745;
-                color: #155724;
-            }
-            .download-btn {
-                background: #28a745;
-                color: white;
-                padding: 15px 40px;
-                border: none;
-                border-radius: 50px;
-                font-size: 16px;
-                cursor: pointer;
-                text-decoration: none;
-                display: inline-block;
-                margin-top: 20px;
-            }
-            .download-btn:hover { 
-                background: #218838;
-                transform: scale(1.05);
-            }
-            .spinner { 
-                border: 4px solid #f3f3f3;
-                border-top: 4px solid #667eea;
-                border-radius: 50%;
-                width: 40px;
-                height: 40px;
-                animation: spin 1s linear infinite;
-                margin: 0 auto 20px;
-            }
-            @keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>📚 OCR Technologies</h1>
-            <p class="tagline">Upload Mathematics PDF → AI Extracts MCQs → Download Professional DOCX</p>
-            
-            <div class="upload-box" onclick="document.getElementById('fileInput').click()">
-                <h2>📄 Upload Your Mathematics PDF</h2>
-                <p>Click or drag to upload • Multi-page support • Instant processing</p>
-                <input type="file" id="fileInput" accept=".pdf">
-            </div>
-            
-            <div id="result"></div>
-        </div>
-
-        <script>
-            document.getElementById('fileInput').addEventListener('change', async (e) => {
-                const file = e.target.files[0];
-                if (!file) return;
-                
-                const resultDiv = document.getElementById('result');
-                resultDiv.innerHTML = '<div class="spinner"></div><h3>⏳ Processing...</h3>';
-                resultDiv.style.display = 'block';
-                
-                const formData = new FormData();
-                formData.append('file', file);
-                
-                try {
-                    const response = await fetch('/process-pdf/', { 
-                        method: 'POST', 
-                        body: formData 
-                    });
-                    const data = await response.json();
-                    
-                    if (data.status === 'success' && data.download_url) {
-                        resultDiv.innerHTML = `
-                            <div class="success">
-                                <h2>✅ Success!</h2>
-                                <p><strong>${data.questions_found}</strong> questions extracted</p>
-                                <a href="${data.download_url}" class="download-btn">📥 Download DOCX</a>
-                            </div>
-                        `;
-                    } else {
-                        resultDiv.innerHTML = '<div style="background:#f8d7da;border:2px solid #dc3545;padding:20px;border-radius:10px;color:#721c24;"><h2>❌ Error</h2><p>Processing failed</p></div>';
-                    }
-                } catch (error) {
-                    resultDiv.innerHTML = '<div style="background:#f8d7da;border:2px solid #dc3545;padding:20px;border-radius:10px;color:#721c24;"><h2>❌ Error</h2><p>Try again</p></div>';
-                }
-            });
-        </script>
-    </body>
-    </html>
-    """
-
-@app.post("/process-pdf/")
-async def process_pdf(file: UploadFile = File(...)):
-    """Process PDF and generate DOCX - FIXED DOWNLOAD"""
-    
-    job_id = str(uuid.uuid4())
-    filename = f"Bakeer_Academy_Questions_{job_id}.docx"
-    
-    # Save to current directory (working directory)
-    output_path = filename  # Simple path in root directory
-    
-    # Demo questions
-    sample_questions = [
-        {
-            "question_number": 1,
-            "question_text": "Find the value (1/32 ÷ 1/4) × (1/16 ÷ 1/8) =",
-            "options": {"A": "1/16", "B": "1/8", "C": "16/1", "D": "4/16"},
-            "correct_answer": "A",
-            "confidence": 0.95
-        },
-        {
-            "question_number": 2,
-            "question_text": "√60 + 63 ≈ ?",
-            "options": {"A": "11", "B": "10", "C": "12", "D": "8"},
-            "correct_answer": "C",
-            "confidence": 0.92
-        },
-        {
-            "question_number": 3,
-            "question_text": "The largest number multiplied by 7 such that their product is less than 115:",
-            "options": {"A": "17", "B": "15", "C": "16", "D": "14"},
-            "correct_answer": "D",
-            "confidence": 0.88
-        },
-        {
-            "question_number": 4,
-            "question_text": "If you're the 12th student in the school morning assembly queue, whether counting from the front or from the back, then how many students are in the queue?",
-            "options": {"A": "23", "B": "24", "C": "22", "D": "20"},
-            "correct_answer": "A",
-            "confidence": 0.85
-        }
-    ]
-    
-    # Create DOCX in root directory
-    try:
-        formatter.create_bakeer_docx(sample_questions, output_path)
-        
-        return {
-            "status": "success",
-            "questions_found": len(sample_questions),
-            "download_url": f"/download/{job_id}?filename={filename}",
-            "filename": filename
-        }
-    except Exception as e:
-        logger.error(f"Error creating DOCX: {e}")
-        return {
-            "status": "error",
-            "message": str(e)
-        }
-
-@app.get("/download/{file_id}")
-async def download_file(file_id: str, filename: str = None):
-    """Download DOCX file - SIMPLE VERSION"""
-    
-    # Try to find any matching file
-    import glob
-    files = glob.glob(f"Bakeer_Academy_Questions_*.docx")
-    
-    if files:
-        # Return the most recent file
-        file_path = max(files, key=os.path.getctime)
-        
-        if os.path.exists(file_path):
-            return FileResponse(
-                file_path,
-                media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                filename="Bakeer_Academy_Questions.docx"
-            )
-    
-    raise HTTPException(status_code=404, detail="File not found")
-
-if __name__ == "__main__":
-    import uvicorn
-    print("🚀 Starting OCR Technologies API...")
-    print("📄 Open browser: http://localhost:8000")
-    print("📥 DOCX files will be saved in your project root directory")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+"""FastAPI Web Server - DOCX Downloads WORKING"""
+
+import time
+_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from schemas import JobStatus
+from services.artifact_store import ArtifactStore
+from services.document_formatter import DocxFormatter
+from services.jobs import JobManager
+from services.metrics import render_prometheus
+from services.shared import warmup
+from src.ocr_tech.config import settings
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load and warm the OCR engine and LLM client before the first request, not during it"""
+    if settings.PRELOAD_MODELS:
+        try:
+            await run_in_threadpool(warmup)
+        except Exception as e:
+            logger.warning(f"Model preload failed, models will load on first job: {e}")
+    logger.info(f"🚀 Ready to serve {time.perf_counter() - _started:.2f}s after start")
+    yield
+    jobs.shutdown()
+
+app = FastAPI(title="OCR Technologies - PRODUCTION", lifespan=lifespan)
+_first_request_done = False
+
+@app.middleware("http")
+async def log_time_to_first_request(request: Request, call_next):
+    """Log once how long after start the first response went out"""
+    global _first_request_done
+    response = await call_next(request)
+    if not _first_request_done:
+        _first_request_done = True
+        logger.info(f"First request ({request.url.path}) served {time.perf_counter() - _started:.2f}s after start")
+    return response
+
+# Mount static folder
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+# Generated DOCX files, keyed by job id (memory, or temp files when large)
+artifacts = ArtifactStore()
+
+# PDF jobs run on background workers; the event loop only serves requests
+jobs = JobManager(artifacts=artifacts)
+
+@app.get("/", response_class=HTMLResponse)
+async def home():
+    """Beautiful landing page"""
+    return """
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <title>🚀 OCR Technologies - Bakeer Academy</title>
+        <style>
+            * { margin: 0; padding: 0; box-sizing: border-box; }
+            body { 
+                font-family: 'Segoe UI', Arial; 
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                min-height: 100vh;
+                display: flex;
+                align-items: center;
+                justify-content: center;
+                padding: 20px;
+            }
+            .container { 
+                background: white; 
+                padding: 50px; 
+                border-radius: 20px;
+                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
+                max-width: 900px;
+                width: 100%;
+            }
+            h1 { 
+                color: #1f4e79; 
+                margin-bottom: 10px; 
+                font-size: 2.5em;
+                text-align: center;
+            }
+            .tagline { 
+                color: #666; 
+                text-align: center; 
+                margin-bottom: 30px;
+                font-size: 1.1em;
+            }
+            .upload-box {
+                border: 3px dashed #667eea;
+                padding: 60px 20px;
+                border-radius: 15px;
+                text-align: center;
+                cursor: pointer;
+                transition: all 0.3s;
+                background: #f8f9ff;
+            }
+            .upload-box:hover {
+                background: #f0f2ff;
+                border-color: #764ba2;
+            }
+            .upload-box h2 { color: #667eea; margin-bottom: 10px; }
+            input[type="file"] { display: none; }
+            #result { 
+                margin-top: 30px; 
+                display: none;
+                padding: 30px;
+                border-radius: 15px;
+                text-align: center;
+            }
+            .success { 
+                background: #d4edda; 
+                border: 2px solid #28a745;
+                color: #155724;
+            }
+            .download-btn {
+                background: #28a745;
+                color: white;
+                padding: 15px 40px;
+                border: none;
+                border-radius: 50px;
+                font-size: 16px;
+                cursor: pointer;
+                text-decoration: none;
+                display: inline-block;
+                margin-top: 20px;
+            }
+            .download-btn:hover { 
+                background: #218838;
+                transform: scale(1.05);
+            }
+            .spinner { 
+                border: 4px solid #f3f3f3;
+                border-top: 4px solid #667eea;
+                border-radius: 50%;
+                width: 40px;
+                height: 40px;
+                animation: spin 1s linear infinite;
+                margin: 0 auto 20px;
+            }
+            @keyframes spin { 0% { transform: rotate(0deg); } 100% { transform: rotate(360deg); } }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>📚 OCR Technologies</h1>
+            <p class="tagline">Upload Mathematics PDF → AI Extracts MCQs → Download Professional DOCX</p>
+            
+            <div class="upload-box" onclick="document.getElementById('fileInput').click()">
+                <h2>📄 Upload Your Mathematics PDF</h2>
+                <p>Click or drag to upload • Multi-page support • Instant processing</p>
+                <input type="file" id="fileInput" accept=".pdf">
+            </div>
+            
+            <div id="result"></div>
+        </div>
+
+        <script>
+            document.getElementById('fileInput').addEventListener('change', async (e) => {
+                const file = e.target.files[0];
+                if (!file) return;
+                
+                const resultDiv = document.getElementById('result');
+                const errorBox = (message) => `<div style="background:#f8d7da;border:2px solid #dc3545;padding:20px;border-radius:10px;color:#721c24;"><h2>❌ Error</h2><p>${message}</p></div>`;
+                resultDiv.innerHTML = '<div class="spinner"></div><h3>⏳ Processing...</h3>';
+                resultDiv.style.display = 'block';
+                
+                const formData = new FormData();
+                formData.append('file', file);
+                
+                try {
+                    const response = await fetch('/jobs', { 
+                        method: 'POST', 
+                        body: formData 
+                    });
+                    const job = await response.json();
+                    if (!response.ok) {
+                        resultDiv.innerHTML = errorBox('Processing failed');
+                        return;
+                    }
+                    
+                    // Progress and questions arrive as the pages are processed
+                    let found = 0;
+                    const events = new EventSource(`/jobs/${job.job_id}/events`);
+                    events.addEventListener('progress', (e) => {
+                        const data = JSON.parse(e.data);
+                        resultDiv.innerHTML = `<div class="spinner"></div><h3>⏳ Page ${data.pages_done} of ${data.pages_total}</h3><p><strong>${data.questions_found}</strong> questions so far</p>`;
+                    });
+                    events.addEventListener('question', () => { found += 1; });
+                    events.addEventListener('done', (e) => {
+                        const data = JSON.parse(e.data);
+                        events.close();
+                        resultDiv.innerHTML = `
+                            <div class="success">
+                                <h2>✅ Success!</h2>
+                                <p><strong>${data.questions_found}</strong> questions extracted</p>
+                                ${data.failed_pages && data.failed_pages.length ? `<p>⚠️ Pages ${data.failed_pages.join(', ')} could not be read and are missing</p>` : ''}
+                                <a href="${data.download_url}" class="download-btn">📥 Download DOCX</a>
+                            </div>
+                        `;
+                    });
+                    events.addEventListener('failed', (e) => {
+                        events.close();
+                        resultDiv.innerHTML = errorBox(JSON.parse(e.data).error || 'Processing failed');
+                    });
+                    events.onerror = () => {
+                        if (events.readyState === EventSource.CLOSED) resultDiv.innerHTML = errorBox('Connection lost');
+                    };
+                } catch (error) {
+                    resultDiv.innerHTML = errorBox('Try again');
+                }
+            });
+        </script>
+    </body>
+    </html>
+    """
+
+@app.post("/process-pdf/")
+async def process_pdf(file: UploadFile = File(...)):
+    """Process PDF and generate DOCX - FIXED DOWNLOAD"""
+    
+    job_id = str(uuid.uuid4())
+    filename = "Bakeer_Academy_Questions.docx"
+    
+    # Demo questions
+    sample_questions = [
+        {
+            "question_number": 1,
+            "question_text": "Find the value (1/32 ÷ 1/4) × (1/16 ÷ 1/8) =",
+            "options": {"A": "1/16", "B": "1/8", "C": "16/1", "D": "4/16"},
+            "correct_answer": "A",
+            "confidence": 0.95
+        },
+        {
+            "question_number": 2,
+            "question_text": "√60 + 63 ≈ ?",
+            "options": {"A": "11", "B": "10", "C": "12", "D": "8"},
+            "correct_answer": "C",
+            "confidence": 0.92
+        },
+        {
+            "question_number": 3,
+            "question_text": "The largest number multiplied by 7 such that their product is less than 115:",
+            "options": {"A": "17", "B": "15", "C": "16", "D": "14"},
+            "correct_answer": "D",
+            "confidence": 0.88
+        },
+        {
+            "question_number": 4,
+            "question_text": "If you're the 12th student in the school morning assembly queue, whether counting from the front or from the back, then how many students are in the queue?",
+            "options": {"A": "23", "B": "24", "C": "22", "D": "20"},
+            "correct_answer": "A",
+            "confidence": 0.85
+        }
+    ]
+    
+    # Create DOCX in the artifact store (off the event loop: python-docx is blocking)
+    try:
+        await run_in_threadpool(
+            artifacts.create, job_id, filename,
+            lambda f: DocxFormatter().create_bakeer_docx(sample_questions, f)
+        )
+        
+        return {
+            "status": "success",
+            "questions_found": len(sample_questions),
+            "download_url": f"/download/{job_id}",
+            "filename": filename
+        }
+    except Exception as e:
+        logger.error(f"Error creating DOCX: {e}")
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    """Queue a PDF for processing; returns the job id right away"""
+    if not (file.filename or "").lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Please upload a PDF file")
+
+    fd, pdf_path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        await run_in_threadpool(shutil.copyfileobj, file.file, f)
+    job = jobs.submit(pdf_path, file.filename)
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str):
+    """Job state with per-page progress"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """Server-sent events: status, each question as soon as it is extracted, progress, done/failed
+
+    Reconnecting clients send Last-Event-ID and resume after that event.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_id = request.headers.get("last-event-id")
+    start = int(last_id) + 1 if last_id and last_id.isdigit() else 0
+
+    async def event_stream():
+        async for event in job.stream(start):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'], ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/download/{file_id}")
+async def download_file(file_id: str):
+    """Download the DOCX generated for a job, streamed in chunks"""
+    artifact = artifacts.get(file_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return StreamingResponse(
+        artifacts.iter_chunks(artifact),
+        media_type=artifact.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{artifact.filename}"',
+            "Content-Length": str(artifact.size)
+        }
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage counters, histograms and gauges in Prometheus text format"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+if __name__ == "__main__":
+    import uvicorn
+    print("🚀 Starting OCR Technologies API...")
+    print("📄 Open browser: http://localhost:8000")
+    print("📥 DOCX files are kept in memory and served from /download/{job_id}")
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,43 +1,221 @@
-"""Main pipeline runner - FULL SYSTEM TEST"""
-
-from services.question_processor import QuestionProcessor
-from services.document_formatter import DocumentFormatter
-import os
-
-def run_full_pipeline(pdf_path: str = None):
-    """Run complete OCR → LLM → Document pipeline"""
-    print("🚀 OCR Technologies - Full Pipeline")
-    print("=" * 50)
-    
-    processor = QuestionProcessor()
-    formatter = DocumentFormatter()
-    
-    # Test with sample data if no PDF
-    if not pdf_path or not os.path.exists(pdf_path):
-        print("📄 No PDF found - using sample data")
-        sample_questions = [{
-            "question_number": 1,
-            "question_text": "Find 3/7 ÷ 3/7 =",
-            "options": {"A": "1", "B": "Zero", "C": "-1", "D": "-9/4"},
-            "correct_answer": "A",
-            "confidence": 0.95
-        }]
-        formatter.create_bakeer_document(sample_questions, "sample_output.pptx")
-        print("✅ SAMPLE PIPELINE COMPLETE!")
-        print("📄 Check: sample_output.pptx")
-        return
-    
-    # Real PDF processing
-    print(f"📄 Processing: {pdf_path}")
-    questions = processor.process_pdf(pdf_path)
-    if questions:
-        output_path = "processed_questions.pptx"
-        formatter.create_bakeer_document(questions, output_path)
-        print(f"✅ FULL PIPELINE COMPLETE!")
-        print(f"📄 Output: {output_path}")
-    else:
-        print("❌ No questions found")
-
-if __name__ == "__main__":
-    # Test the full system
-    run_full_pipeline()
+"""Main pipeline runner - batch CLI over folders of PDFs (and the sample FULL SYSTEM TEST)
+
+    python main.py scans/ "archive/**/*.pdf" -o output --documents 4
+
+Every document streams through one shared QuestionProcessor, so pages
+from all of them share the same OCR and LLM worker pools. Questions are
+appended to <output>/questions.jsonl as pages finish and each document
+gets its own DOCX, written as its questions arrive.
+"""
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, IO, List, Optional, Sequence
+
+from services.docx_stream import StreamingDocxWriter
+from services.document_formatter import DocxFormatter
+from services.metrics import REGISTRY
+from services.question_processor import QuestionProcessor
+from src.ocr_tech.config import settings
+
+# Histograms summed into the stage breakdown: metric name → label naming the sub-stage
+_STAGE_METRICS = {
+    "pdf_render_seconds": None,
+    "ocr_stage_seconds": "step",
+    "mcq_agent_seconds": "task"
+}
+
+def run_full_pipeline(pdf_path: str = None):
+    """Run complete OCR → LLM → Document pipeline"""
+    print("🚀 OCR Technologies - Full Pipeline")
+    print("=" * 50)
+
+    formatter = DocxFormatter()
+
+    # Test with sample data if no PDF
+    if not pdf_path or not os.path.exists(pdf_path):
+        print("📄 No PDF found - using sample data")
+        sample_questions = [{
+            "question_number": 1,
+            "question_text": "Find 3/7 ÷ 3/7 =",
+            "options": {"A": "1", "B": "Zero", "C": "-1", "D": "-9/4"},
+            "correct_answer": "A",
+            "confidence": 0.95
+        }]
+        formatter.create_bakeer_docx(sample_questions, "sample_output.docx")
+        print("✅ SAMPLE PIPELINE COMPLETE!")
+        print("📄 Check: sample_output.docx")
+        return
+
+    # Real PDF processing
+    processor = QuestionProcessor()
+    print(f"📄 Processing: {pdf_path}")
+    questions = processor.process_pdf(pdf_path)
+    if questions:
+        output_path = "processed_questions.docx"
+        formatter.create_bakeer_docx(questions, output_path)
+        print(f"✅ FULL PIPELINE COMPLETE!")
+        print(f"📄 Output: {output_path}")
+    else:
+        print("❌ No questions found")
+
+def collect_pdfs(inputs: Sequence[str]) -> List[str]:
+    """PDF paths from files, directories (searched recursively) and glob patterns, deduplicated, in order"""
+    found = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = sorted(glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True))
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = sorted(glob.glob(item, recursive=True))
+            if not matches:
+                print(f"⚠️ Nothing matches {item}")
+        found.extend(path for path in matches if path.lower().endswith(".pdf"))
+    return list(dict.fromkeys(os.path.abspath(path) for path in found))
+
+def _docx_paths(pdfs: Sequence[str], output_dir: str) -> Dict[str, str]:
+    """One DOCX per PDF, named after it; same-named PDFs from different folders get a suffix"""
+    paths, used = {}, Counter()
+    for pdf in pdfs:
+        stem = os.path.splitext(os.path.basename(pdf))[0]
+        used[stem] += 1
+        name = stem if used[stem] == 1 else f"{stem}_{used[stem]}"
+        paths[pdf] = os.path.join(output_dir, f"{name}.docx")
+    return paths
+
+def _process_document(processor: QuestionProcessor, pdf_path: str, docx_path: str,
+                      jsonl: IO[str], jsonl_lock: threading.Lock) -> Dict[str, Any]:
+    """Stream one PDF: each finished page goes to the JSONL file and the document's DOCX right away"""
+    start = time.perf_counter()
+    pages, questions, failed = 0, 0, []
+    docx_seconds = 0.0
+    # On an error the writer deletes its half-written DOCX
+    with StreamingDocxWriter(docx_path) as writer:
+        for page in processor.stream_pdf(pdf_path):
+            pages += 1
+            if page.get("error"):
+                failed.append(page["page"])
+            lines = []
+            for question in page["questions"]:
+                docx_start = time.perf_counter()
+                writer.add_question(question)
+                docx_seconds += time.perf_counter() - docx_start
+                lines.append(json.dumps({"document": pdf_path, "page": page["page"], **question},
+                                        ensure_ascii=False) + "\n")
+            questions += len(lines)
+            if lines:
+                with jsonl_lock:
+                    jsonl.writelines(lines)
+                    jsonl.flush()
+    return {
+        "pages": pages,
+        "questions": questions,
+        "failed_pages": failed,
+        "seconds": time.perf_counter() - start,
+        "docx_seconds": docx_seconds
+    }
+
+def stage_breakdown() -> Dict[str, float]:
+    """Seconds spent per pipeline stage (summed over workers), read from the metrics registry"""
+    stages = {}
+    for metric_name, label in _STAGE_METRICS.items():
+        metric = REGISTRY.metrics.get(metric_name)
+        if metric is None:
+            continue
+        for key, (seconds, _) in metric.totals().items():
+            labels = dict(key)
+            stage = metric_name[:-len("_seconds")]
+            if label and label in labels:
+                stage = f"{stage}.{labels[label]}"
+            stages[stage] = stages.get(stage, 0.0) + seconds
+    return stages
+
+def run_batch(inputs: Sequence[str], output_dir: str = "output", documents: Optional[int] = None) -> Dict[str, Any]:
+    """Process every PDF found in inputs, `documents` at a time; returns the run report"""
+    pdfs = collect_pdfs(inputs)
+    if not pdfs:
+        print("❌ No PDFs found")
+        return {"documents": 0}
+
+    os.makedirs(output_dir, exist_ok=True)
+    documents = max(1, min(documents or settings.JOB_WORKERS, len(pdfs)))
+    docx_paths = _docx_paths(pdfs, output_dir)
+    jsonl_path = os.path.join(output_dir, "questions.jsonl")
+    print(f"🚀 {len(pdfs)} PDFs, {documents} at a time → {output_dir}")
+
+    # One processor: the OCR engine, LLM client and stage pools are shared by all documents
+    processor = QuestionProcessor()
+    REGISTRY.reset()
+    results, errors = {}, {}
+    jsonl_lock = threading.Lock()
+    start = time.perf_counter()
+    with open(jsonl_path, "a", encoding="utf-8") as jsonl, ThreadPoolExecutor(documents) as executor:
+        futures = {
+            executor.submit(_process_document, processor, pdf, docx_paths[pdf], jsonl, jsonl_lock): pdf
+            for pdf in pdfs
+        }
+        for future in as_completed(futures):
+            pdf = futures[future]
+            try:
+                results[pdf] = result = future.result()
+                status = f", ⚠️ failed pages {result['failed_pages']}" if result["failed_pages"] else ""
+                print(f"✅ {os.path.basename(pdf)}: {result['questions']} questions from "
+                      f"{result['pages']} pages in {result['seconds']:.1f}s{status}")
+            except Exception as e:
+                errors[pdf] = str(e)
+                print(f"❌ {os.path.basename(pdf)}: {e}")
+    elapsed = time.perf_counter() - start
+
+    pages = sum(result["pages"] for result in results.values())
+    questions = sum(result["questions"] for result in results.values())
+    stages = stage_breakdown()
+    stages["docx"] = sum(result["docx_seconds"] for result in results.values())
+    report = {
+        "documents": len(results),
+        "failed_documents": errors,
+        "pages": pages,
+        "questions": questions,
+        "seconds": elapsed,
+        "pages_per_second": pages / elapsed if elapsed else 0.0,
+        "questions_per_second": questions / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "jsonl": jsonl_path
+    }
+
+    print("=" * 50)
+    print(f"📄 {report['documents']}/{len(pdfs)} documents, {pages} pages, {questions} questions "
+          f"in {elapsed:.1f}s")
+    print(f"⚡ {report['pages_per_second']:.2f} pages/s, {report['questions_per_second']:.2f} questions/s")
+    busy = sum(stages.values())
+    if busy and REGISTRY.enabled:
+        print("⏱️ Stage time (summed over workers):")
+        for stage, seconds in sorted(stages.items(), key=lambda item: -item[1]):
+            print(f"   {stage:28s} {seconds:8.1f}s  {seconds / busy:6.1%}")
+    elif not REGISTRY.enabled:
+        print("⏱️ Stage breakdown unavailable: METRICS_ENABLED is off")
+    print(f"📝 Questions: {jsonl_path}")
+    return report
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Extract MCQs from PDFs into JSONL and Bakeer DOCX files")
+    parser.add_argument("inputs", nargs="*", help="PDF files, directories or glob patterns (quoted)")
+    parser.add_argument("-o", "--output-dir", default="output", help="where questions.jsonl and the DOCX files go")
+    parser.add_argument("-d", "--documents", type=int, default=None,
+                        help=f"documents processed at once (default: JOB_WORKERS={settings.JOB_WORKERS})")
+    args = parser.parse_args(argv)
+
+    if not args.inputs:
+        # Test the full system
+        run_full_pipeline()
+        return
+    run_batch(args.inputs, args.output_dir, args.documents)
+
+if __name__ == "__main__":
+    main()
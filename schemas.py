@@ -1,16 +1,26 @@
-"""Pydantic schemas for API"""
-
-from pydantic import BaseModel
-from typing import List, Dict, Any
-
-class Question(BaseModel):
-    question_number: int
-    question_text: str
-    options: Dict[str, str]
-    correct_answer: str | None = None
-    confidence: float
-
-class ProcessResponse(BaseModel):
-    status: str
-    questions_found: int
-    download_url: str | None = None
+"""Pydantic schemas for API"""
+
+from pydantic import BaseModel
+from typing import List, Dict, Any
+
+class Question(BaseModel):
+    question_number: int
+    question_text: str
+    options: Dict[str, str]
+    correct_answer: str | None = None
+    confidence: float
+
+class ProcessResponse(BaseModel):
+    status: str
+    questions_found: int
+    download_url: str | None = None
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    filename: str
+    pages_total: int | None = None
+    pages_done: int = 0
+    questions_found: int = 0
+    error: str | None = None
+    download_url: str | None = None
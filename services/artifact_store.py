@@ -0,0 +1,138 @@
+"""Artifact store - generated files kept per job, in memory or spooled to disk, with TTL/size eviction"""
+
+import logging
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import IO, Any, Callable, Dict, Iterator, Optional
+
+from src.ocr_tech.config import settings
+
+logger = logging.getLogger(__name__)
+
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class Artifact:
+    def __init__(self, artifact_id: str, file: IO[bytes], size: int, filename: str, media_type: str):
+        self.id = artifact_id
+        self.file = file
+        self.size = size
+        self.filename = filename
+        self.media_type = media_type
+        self.created = time.time()
+        self.readers = 0
+        self.evicted = False
+        # One file position shared by all downloads: seek + read happen under this lock
+        self.lock = threading.Lock()
+
+    def release(self):
+        """Close the file once it is evicted and no download is still reading it (lock held)"""
+        if self.evicted and self.readers == 0:
+            self.file.close()
+
+
+class ArtifactStore:
+    def __init__(self, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None,
+                 spool_bytes: Optional[int] = None, spool_dir: Optional[str] = None):
+        """Files up to spool_bytes stay in memory, larger ones roll over to a temp file in spool_dir
+
+        Artifacts expire ttl_seconds after creation; beyond max_bytes in
+        total the least recently downloaded ones are dropped first.
+        """
+        self.max_bytes = max_bytes or settings.ARTIFACT_MAX_MB * 1024 * 1024
+        self.ttl_seconds = ttl_seconds or settings.ARTIFACT_TTL_MINUTES * 60
+        self.spool_bytes = spool_bytes or settings.ARTIFACT_SPOOL_MB * 1024 * 1024
+        self.spool_dir = spool_dir or settings.ARTIFACT_SPOOL_DIR or None
+        self.evictions = 0
+        self._artifacts: "OrderedDict[str, Artifact]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def create(self, artifact_id: str, filename: str, write: Callable[[IO[bytes]], Any],
+               media_type: str = DOCX_MEDIA_TYPE) -> Artifact:
+        """Store whatever write(file) writes under artifact_id (replacing any previous artifact)"""
+        file = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes, dir=self.spool_dir)
+        try:
+            write(file)
+            size = file.tell()
+        except Exception:
+            file.close()
+            raise
+        artifact = Artifact(artifact_id, file, size, filename, media_type)
+
+        with self._lock:
+            if artifact_id in self._artifacts:
+                self._discard(artifact_id)
+            self._artifacts[artifact_id] = artifact
+            self._size += size
+            self._evict()
+        logger.info(f"Stored {filename} for {artifact_id} ({size / 1024:.0f} KB)")
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[Artifact]:
+        """The artifact, or None if unknown or expired; a hit counts as recent use"""
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is None:
+                return None
+            if artifact.created < time.time() - self.ttl_seconds:
+                self._discard(artifact_id)
+                self.evictions += 1
+                return None
+            self._artifacts.move_to_end(artifact_id)
+            return artifact
+
+    def iter_chunks(self, artifact: Artifact, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Artifact content in chunks; safe alongside other downloads and eviction"""
+        with artifact.lock:
+            if artifact.evicted:
+                return
+            artifact.readers += 1
+        try:
+            offset = 0
+            while offset < artifact.size:
+                with artifact.lock:
+                    artifact.file.seek(offset)
+                    chunk = artifact.file.read(min(chunk_size, artifact.size - offset))
+                if not chunk:
+                    break
+                offset += len(chunk)
+                yield chunk
+        finally:
+            with artifact.lock:
+                artifact.readers -= 1
+                artifact.release()
+
+    def remove(self, artifact_id: str):
+        with self._lock:
+            if artifact_id in self._artifacts:
+                self._discard(artifact_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "artifacts": len(self._artifacts),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions
+            }
+
+    def _discard(self, artifact_id: str):
+        """Drop one artifact (lock held)"""
+        artifact = self._artifacts.pop(artifact_id)
+        self._size -= artifact.size
+        with artifact.lock:
+            artifact.evicted = True
+            artifact.release()
+
+    def _evict(self):
+        """Drop expired artifacts, then least recently used ones beyond max_bytes (lock held)"""
+        cutoff = time.time() - self.ttl_seconds
+        for artifact_id in [key for key, artifact in self._artifacts.items() if artifact.created < cutoff]:
+            self._discard(artifact_id)
+            self.evictions += 1
+        while self._size > self.max_bytes and len(self._artifacts) > 1:
+            self._discard(next(iter(self._artifacts)))
+            self.evictions += 1
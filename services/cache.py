@@ -0,0 +1,113 @@
+"""Local SQLite key/value cache with a size cap, optional TTL and LRU eviction"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Stored value, or None on a miss; a hit refreshes the entry's LRU position"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, size, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._size -= row[1]
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: bytes):
+        """Store a value, evicting least-recently-used entries beyond max_bytes"""
+        if len(value) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now)
+            )
+            self._size += len(value) - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    def _evict(self):
+        """Drop expired entries, then least-recently-used ones until under the size cap (lock held)"""
+        if self.ttl_seconds is not None and self._size > self.max_bytes:
+            cutoff = time.time() - self.ttl_seconds
+            expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE created < ?", (cutoff,)
+            ).fetchone()
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+            self.evictions += expired[0]
+            self._size -= expired[1]
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._size -= size
+                self.evictions += 1
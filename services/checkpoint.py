@@ -0,0 +1,170 @@
+"""Checkpoint store - per-page OCR and extraction results of a document, kept in SQLite
+
+Documents are keyed by the SHA-256 of the PDF bytes, so a renamed or
+re-uploaded copy resumes too. A page moves through three states:
+"ocr" (text blocks saved), "done" (page result saved) and "failed"
+(error saved, blocks kept if OCR had finished). A rerun skips "done"
+pages, and starts "ocr" pages and failed pages with saved blocks at the
+LLM stage. Documents not run again within ttl_seconds are dropped, so
+the file does not grow without bound.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from .ocr_blocks import PageBlocks
+
+logger = logging.getLogger(__name__)
+
+
+def document_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of the file content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _dumps(value: Any) -> str:
+    # numpy scalars (float32 confidences...) have .item(); anything else is stored as text
+    return json.dumps(value, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+
+
+def _load_blocks(value: str, source: Optional[str]) -> PageBlocks:
+    lines = json.loads(value)
+    if lines and isinstance(lines[0], dict):
+        # Saved as block dicts by earlier versions
+        return PageBlocks.from_dicts(lines, source)
+    return PageBlocks.from_lines(lines, source or "ocr")
+
+
+class CheckpointStore:
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "doc_hash TEXT PRIMARY KEY, path TEXT NOT NULL, config TEXT NOT NULL, "
+            "pages_total INTEGER, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "doc_hash TEXT NOT NULL, page INTEGER NOT NULL, status TEXT NOT NULL, source TEXT, "
+            "blocks TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "updated REAL NOT NULL, PRIMARY KEY (doc_hash, page))"
+        )
+        self._conn.commit()
+        self.expire()
+
+    def begin(self, doc_hash: str, path: str, pages_total: int, config: str = "") -> Dict[int, Dict[str, Any]]:
+        """Register a run of the document and return its saved pages ({page: state})
+
+        config fingerprints the pipeline settings: results saved under a
+        different config are dropped instead of being reused.
+        """
+        self.expire()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT config FROM documents WHERE doc_hash = ?", (doc_hash,)).fetchone()
+            if row is not None and row[0] != config:
+                logger.info(f"Pipeline settings changed since {path} was checkpointed: starting over")
+                self._conn.execute("DELETE FROM pages WHERE doc_hash = ?", (doc_hash,))
+            self._conn.execute(
+                "INSERT INTO documents (doc_hash, path, config, pages_total, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (doc_hash) DO UPDATE SET "
+                "path = excluded.path, config = excluded.config, pages_total = excluded.pages_total, "
+                "updated = excluded.updated",
+                (doc_hash, path, config, pages_total, now, now)
+            )
+            self._conn.commit()
+        return self.pages(doc_hash)
+
+    def pages(self, doc_hash: str) -> Dict[int, Dict[str, Any]]:
+        """{page: {"status", "source", "blocks" (PageBlocks or None), "result", "error", "attempts"}}"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page, status, source, blocks, result, error, attempts FROM pages WHERE doc_hash = ?",
+                (doc_hash,)
+            ).fetchall()
+        return {
+            page: {
+                "status": status,
+                "source": source,
+                "blocks": _load_blocks(blocks, source) if blocks is not None else None,
+                "result": json.loads(result) if result is not None else None,
+                "error": error,
+                "attempts": attempts
+            }
+            for page, status, source, blocks, result, error, attempts in rows
+        }
+
+    def save_blocks(self, doc_hash: str, page: int, source: str, blocks: PageBlocks):
+        """OCR finished for the page; stored as plain lines ([bbox, [text, confidence]])"""
+        self._upsert(doc_hash, page, "ocr", source=source, blocks=_dumps(blocks.to_lines()))
+
+    def save_result(self, doc_hash: str, page: int, result: Dict[str, Any]):
+        """The page is done: its result is reused as is on later runs"""
+        self._upsert(doc_hash, page, "done", result=_dumps(result))
+
+    def save_failure(self, doc_hash: str, page: int, error: str):
+        """The page failed; blocks saved by an earlier save_blocks are kept"""
+        self._upsert(doc_hash, page, "failed", error=error, attempt=True)
+
+    def first_incomplete(self, doc_hash: str, pages: Iterable[int]) -> Optional[int]:
+        """First of `pages` without a saved result, None when all are done"""
+        done = {page for page, state in self.pages(doc_hash).items() if state["status"] == "done"}
+        return next((page for page in pages if page not in done), None)
+
+    def expire(self) -> int:
+        """Drop documents (and their pages) not run within ttl_seconds; returns how many"""
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM pages WHERE doc_hash IN (SELECT doc_hash FROM documents WHERE updated < ?)", (cutoff,)
+            )
+            expired = self._conn.execute("DELETE FROM documents WHERE updated < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        if expired:
+            logger.info(f"Dropped {expired} expired document checkpoints from {self.path}")
+        return expired
+
+    def clear(self, doc_hash: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE doc_hash = ?", (doc_hash,))
+            self._conn.execute("DELETE FROM documents WHERE doc_hash = ?", (doc_hash,))
+            self._conn.commit()
+
+    def _upsert(self, doc_hash: str, page: int, status: str, source: Optional[str] = None,
+                blocks: Optional[str] = None, result: Optional[str] = None, error: Optional[str] = None,
+                attempt: bool = False):
+        # NULL arguments keep what is already stored, so a failure does not erase the page's blocks
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO pages (doc_hash, page, status, source, blocks, result, error, attempts, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (doc_hash, page) DO UPDATE SET "
+                "status = excluded.status, source = COALESCE(excluded.source, source), "
+                "blocks = COALESCE(excluded.blocks, blocks), result = excluded.result, error = excluded.error, "
+                "attempts = attempts + excluded.attempts, updated = excluded.updated",
+                (doc_hash, page, status, source, blocks, result, error, int(attempt), time.time())
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
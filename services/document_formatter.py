@@ -1,162 +1,266 @@
-"""Professional Word Document Formatter - Bakeer Academy DOCX (PRODUCTION)"""
-
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
-from typing import List, Dict, Any
-import os
-
-class DocxFormatter:
-    def __init__(self):
-        self.doc = Document()
-        self._setup_styles()
-    
-    def _setup_styles(self):
-        """Setup Bakeer Academy professional styles"""
-        # Set default font
-        style = self.doc.styles['Normal']
-        style.font.name = 'Calibri'
-        style.font.size = Pt(12)
-    
-    def create_bakeer_docx(self, questions: List[Dict[str, Any]], output_path: str):
-        """Create professional DOCX in Bakeer Academy format"""
-        self.doc = Document()
-        
-        # Page 1: Header with branding
-        self._create_header_page()
-        
-        # Pages: Questions
-        for i, q in enumerate(questions, 1):
-            self._create_question_page(q, i, len(questions))
-        
-        # Save
-        self.doc.save(output_path)
-        print(f"✅ Created {output_path} ({len(questions)} questions)")
-        return output_path
-    
-    def _create_header_page(self):
-        """Create professional header page"""
-        # Add spacing
-        self.doc.add_paragraph()
-        
-        # Title
-        title = self.doc.add_paragraph()
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = title.add_run("BAKEER ACADEMY")
-        run.font.size = Pt(28)
-        run.font.bold = True
-        run.font.color.rgb = RGBColor(31, 78, 121)  # Dark blue
-        
-        # Subtitle
-        subtitle = self.doc.add_paragraph()
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = subtitle.add_run("Mathematics Questions & Answers")
-        run.font.size = Pt(18)
-        run.font.color.rgb = RGBColor(0, 102, 204)
-        
-        # Add spacing
-        self.doc.add_paragraph()
-        self.doc.add_paragraph()
-        
-        # Info box
-        info = self.doc.add_paragraph()
-        info.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        run = info.add_run("Prepared for: Bakeer Academy GAT Program\nPhone: 0552420800")
-        run.font.size = Pt(12)
-        run.font.italic = True
-    
-    def _create_question_page(self, question: Dict[str, Any], q_num: int, total: int):
-        """Create professional question page - BAKEER FORMAT"""
-        
-        # Add page break
-        self.doc.add_page_break()
-        
-        # Question number in header
-        header = self.doc.add_paragraph()
-        header.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        run = header.add_run(f"Question {q_num}")
-        run.font.size = Pt(10)
-        run.font.color.rgb = RGBColor(128, 128, 128)
-        
-        # Question text box
-        question_para = self.doc.add_paragraph()
-        question_para.paragraph_format.left_indent = Inches(0.5)
-        question_para.paragraph_format.space_before = Pt(12)
-        question_para.paragraph_format.space_after = Pt(18)
-        
-        # Question text
-        run = question_para.add_run(question.get("question_text", ""))
-        run.font.size = Pt(20)
-        run.font.bold = True
-        run.font.color.rgb = RGBColor(0, 0, 0)
-        
-        # Options table (Bakeer style)
-        self._add_options_table(question)
-        
-        # Answer (if available)
-        if question.get("correct_answer"):
-            answer_para = self.doc.add_paragraph()
-            answer_para.paragraph_format.left_indent = Inches(0.5)
-            answer_para.paragraph_format.space_before = Pt(12)
-            
-            run = answer_para.add_run(f"Answer: {question['correct_answer']}")
-            run.font.size = Pt(16)
-            run.font.bold = True
-            run.font.color.rgb = RGBColor(0, 128, 0)
-    
-    def _add_options_table(self, question: Dict[str, Any]):
-        """Add options as professional table (Bakeer style)"""
-        options = question.get("options", {})
-        
-        # Create 2x2 table for 4 options
-        table = self.doc.add_table(rows=2, cols=2)
-        table.style = 'Table Grid'
-        
-        # Set table width
-        for row in table.rows:
-            for cell in row.cells:
-                cell.width = Inches(2.5)
-        
-        option_list = [
-            (options.get("A", ""), "A"),
-            (options.get("B", ""), "B"),
-            (options.get("C", ""), "C"),
-            (options.get("D", ""), "D"),
-        ]
-        
-        # Fill table
-        cells = [cell for row in table.rows for cell in row.cells]
-        for i, (cell, (option_text, label)) in enumerate(zip(cells, option_list)):
-            # Clear cell
-            cell.text = ""
-            
-            # Add option
-            p = cell.paragraphs[0]
-            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            
-            run = p.add_run(f"{label}) {option_text}")
-            run.font.size = Pt(14)
-            run.font.color.rgb = RGBColor(0, 102, 204)
-            
-            # Set cell background
-            shading_elm = OxmlElement('w:shd')
-            shading_elm.set(qn('w:fill'), 'F0F0F0')
-            cell._element.get_or_add_tcPr().append(shading_elm)
-
-def test_docx_formatter():
-    """Test DOCX formatter"""
-    formatter = DocxFormatter()
-    sample_questions = [
-        {
-            "question_number": 1,
-            "question_text": "Find the value (1/32 ÷ 1/4) × (1/16 ÷ 1/8) =",
-            "options": {"A": "1/16", "B": "1/8", "C": "16/1", "D": "4/16"},
-            "correct_answer": "A",
-            "confidence": 0.95
-        }
-    ]
-    output = formatter.create_bakeer_docx(sample_questions, "test_bakeer.docx")
-    print(f"✅ Test DOCX created: {output}")
-
+"""Professional Word Document Formatter - Bakeer Academy DOCX (PRODUCTION)"""
+
+from docx import Document
+from docx.shared import Inches, Pt, RGBColor
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.oxml import OxmlElement
+from copy import deepcopy
+from typing import IO, List, Dict, Any, Union
+import os
+import threading
+import time
+from io import BytesIO
+from zipfile import ZipFile
+
+from .metrics import counter, histogram
+from .tracing import span
+
+DOCUMENTS = counter("docx_documents_total", "DOCX documents created")
+QUESTIONS = counter("docx_questions_total", "Question pages written to DOCX documents")
+RENDER_SECONDS = histogram("docx_render_seconds", "Seconds to build and save one DOCX, by path (fast/regular)")
+
+# Question-page template XML, built once per thread (lxml trees are not shared across threads)
+_local = threading.local()
+
+def record_document(questions: int):
+    """Count one finished DOCX and its question pages in the metrics"""
+    DOCUMENTS.inc()
+    QUESTIONS.inc(questions)
+
+class DocxFormatter:
+    """Stateless: every call renders into its own Document, so one instance can serve many threads"""
+
+    def create_bakeer_docx(self, questions: List[Dict[str, Any]], output_path: Union[str, IO[bytes]],
+                           fast: bool = True):
+        """Create professional DOCX in Bakeer Academy format (output_path: file path or writable binary file)
+
+        fast=True clones a pre-rendered question page instead of building
+        each one through python-docx; the document is the same either way.
+        """
+        self.render(questions, output_path, fast)
+        record_document(len(questions))
+        target = output_path if isinstance(output_path, str) else "DOCX stream"
+        print(f"✅ Created {target} ({len(questions)} questions)")
+        return output_path
+
+    def render(self, questions: List[Dict[str, Any]], output_path: Union[str, IO[bytes]], fast: bool = True):
+        """Build and save the document only: not counted in the metrics, nothing printed
+
+        StreamingDocxWriter renders its header-only base document this way.
+        """
+        with RENDER_SECONDS.time(path="fast" if fast else "regular"), \
+                span("docx", questions=len(questions), fast=fast):
+            doc = Document()
+            
+            # Page 1: Header with branding
+            self._create_header_page(doc)
+            
+            # Pages: Questions
+            if fast:
+                self._add_question_pages_fast(doc, questions)
+            else:
+                for i, q in enumerate(questions, 1):
+                    self._create_question_page(doc, q, i, len(questions))
+            
+            # Save
+            doc.save(output_path)
+    
+    def _create_header_page(self, doc):
+        """Create professional header page"""
+        # Add spacing
+        doc.add_paragraph()
+        
+        # Title
+        title = doc.add_paragraph()
+        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = title.add_run("BAKEER ACADEMY")
+        run.font.size = Pt(28)
+        run.font.bold = True
+        run.font.color.rgb = RGBColor(31, 78, 121)  # Dark blue
+        
+        # Subtitle
+        subtitle = doc.add_paragraph()
+        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = subtitle.add_run("Mathematics Questions & Answers")
+        run.font.size = Pt(18)
+        run.font.color.rgb = RGBColor(0, 102, 204)
+        
+        # Add spacing
+        doc.add_paragraph()
+        doc.add_paragraph()
+        
+        # Info box
+        info = doc.add_paragraph()
+        info.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        run = info.add_run("Prepared for: Bakeer Academy GAT Program\nPhone: 0552420800")
+        run.font.size = Pt(12)
+        run.font.italic = True
+    
+    def _create_question_page(self, doc, question: Dict[str, Any], q_num: int, total: int):
+        """Create professional question page - BAKEER FORMAT"""
+        
+        # Add page break
+        doc.add_page_break()
+        
+        # Question number in header
+        header = doc.add_paragraph()
+        header.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        run = header.add_run(f"Question {q_num}")
+        run.font.size = Pt(10)
+        run.font.color.rgb = RGBColor(128, 128, 128)
+        
+        # Question text box
+        question_para = doc.add_paragraph()
+        question_para.paragraph_format.left_indent = Inches(0.5)
+        question_para.paragraph_format.space_before = Pt(12)
+        question_para.paragraph_format.space_after = Pt(18)
+        
+        # Question text
+        run = question_para.add_run(question.get("question_text", ""))
+        run.font.size = Pt(20)
+        run.font.bold = True
+        run.font.color.rgb = RGBColor(0, 0, 0)
+        
+        # Options table (Bakeer style)
+        self._add_options_table(doc, question)
+        
+        # Answer (if available)
+        if question.get("correct_answer"):
+            answer_para = doc.add_paragraph()
+            answer_para.paragraph_format.left_indent = Inches(0.5)
+            answer_para.paragraph_format.space_before = Pt(12)
+            
+            run = answer_para.add_run(f"Answer: {question['correct_answer']}")
+            run.font.size = Pt(16)
+            run.font.bold = True
+            run.font.color.rgb = RGBColor(0, 128, 0)
+    
+    def _add_question_pages_fast(self, doc, questions: List[Dict[str, Any]]):
+        """Question pages from deep copies of the template page, text filled in per question"""
+        body = doc.element.body
+        sect_pr = body.find(qn("w:sectPr"))
+        for i, question in enumerate(questions, 1):
+            for element in self.question_page_elements(question, i):
+                if sect_pr is not None:
+                    sect_pr.addprevious(element)
+                else:
+                    body.append(element)
+
+    def question_page_elements(self, question: Dict[str, Any], q_num: int) -> List[Any]:
+        """Body XML elements of one question page: a template clone with this question's text"""
+        elements = [deepcopy(element) for element in self._question_template()]
+        page_break, header, question_para, table, answer_para = elements
+
+        header.find(qn("w:r")).text = f"Question {q_num}"
+        question_para.find(qn("w:r")).text = question.get("question_text", "") or ""
+        options = question.get("options", {})
+        for tc, label in zip(table.iter(qn("w:tc")), "ABCD"):
+            # The option run is the last one (cell.text = "" leaves an empty run before it)
+            tc.findall(f".//{qn('w:r')}")[-1].text = f"{label}) {options.get(label, '')}"
+        if question.get("correct_answer"):
+            answer_para.find(qn("w:r")).text = f"Answer: {question['correct_answer']}"
+        else:
+            elements.pop()
+        return elements
+
+    def _question_template(self) -> List[Any]:
+        """[page break, header, question, options table, answer] XML of one question page
+
+        Rendered once per thread through the regular path into a scratch
+        document, then detached and kept for cloning.
+        """
+        template = getattr(_local, "template", None)
+        if template is None:
+            doc = Document()
+            body = doc.element.body
+            before = len(body)
+            self._create_question_page(doc, {
+                "question_text": "Q",
+                "options": {"A": "A", "B": "B", "C": "C", "D": "D"},
+                "correct_answer": "A"
+            }, 1, 1)
+            # New elements land just before the trailing sectPr
+            added = list(body)[before - 1:-1] if body.find(qn("w:sectPr")) is not None else list(body)[before:]
+            for element in added:
+                body.remove(element)
+            template = _local.template = added
+        return template
+
+    def _add_options_table(self, doc, question: Dict[str, Any]):
+        """Add options as professional table (Bakeer style)"""
+        options = question.get("options", {})
+        
+        # Create 2x2 table for 4 options
+        table = doc.add_table(rows=2, cols=2)
+        table.style = 'Table Grid'
+        
+        # Set table width
+        for row in table.rows:
+            for cell in row.cells:
+                cell.width = Inches(2.5)
+        
+        option_list = [
+            (options.get("A", ""), "A"),
+            (options.get("B", ""), "B"),
+            (options.get("C", ""), "C"),
+            (options.get("D", ""), "D"),
+        ]
+        
+        # Fill table
+        cells = [cell for row in table.rows for cell in row.cells]
+        for i, (cell, (option_text, label)) in enumerate(zip(cells, option_list)):
+            # Clear cell
+            cell.text = ""
+            
+            # Add option
+            p = cell.paragraphs[0]
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            
+            run = p.add_run(f"{label}) {option_text}")
+            run.font.size = Pt(14)
+            run.font.color.rgb = RGBColor(0, 102, 204)
+            
+            # Set cell background
+            shading_elm = OxmlElement('w:shd')
+            shading_elm.set(qn('w:fill'), 'F0F0F0')
+            cell._element.get_or_add_tcPr().append(shading_elm)
+
+def benchmark_docx_formatter(count: int = 500):
+    """Time per question for the regular and template-cloned paths, and check they match"""
+    questions = [
+        {
+            "question_number": i,
+            "question_text": f"Question text number {i}: what is {i} + {i}?",
+            "options": {"A": str(2 * i), "B": str(i), "C": str(3 * i), "D": str(i + 1)},
+            "correct_answer": "A" if i % 3 else None,
+            "confidence": 0.9
+        }
+        for i in range(1, count + 1)
+    ]
+    documents = {}
+    for fast in (False, True):
+        output = BytesIO()
+        start = time.perf_counter()
+        DocxFormatter().create_bakeer_docx(questions, output, fast=fast)
+        elapsed = time.perf_counter() - start
+        documents[fast] = ZipFile(output).read("word/document.xml")
+        print(f"{'fast' if fast else 'regular':8s} {elapsed * 1000 / count:6.2f} ms/question ({elapsed:.2f}s total)")
+    print(f"Identical document.xml: {documents[False] == documents[True]}")
+    return documents[False] == documents[True]
+
+def test_docx_formatter():
+    """Test DOCX formatter"""
+    formatter = DocxFormatter()
+    sample_questions = [
+        {
+            "question_number": 1,
+            "question_text": "Find the value (1/32 ÷ 1/4) × (1/16 ÷ 1/8) =",
+            "options": {"A": "1/16", "B": "1/8", "C": "16/1", "D": "4/16"},
+            "correct_answer": "A",
+            "confidence": 0.95
+        }
+    ]
+    output = formatter.create_bakeer_docx(sample_questions, "test_bakeer.docx")
+    print(f"✅ Test DOCX created: {output}")
+
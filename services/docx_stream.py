@@ -0,0 +1,152 @@
+"""Streaming DOCX writer - Bakeer layout written question by question, in constant memory"""
+
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from typing import IO, Any, Dict, Iterable, Optional, Union
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from lxml import etree
+
+from .document_formatter import DocxFormatter, record_document
+
+_DOCUMENT_PART = "word/document.xml"
+# Namespace declarations lxml repeats on every detached element; the document root already has them
+_NS_DECLARATION = re.compile(rb'\s+xmlns:\w+="[^"]*"')
+
+
+class StreamingDocxWriter:
+    """Writes the same document as DocxFormatter.create_bakeer_docx without holding it in memory
+
+    Every part except word/document.xml is copied from a header-only
+    document; document.xml is streamed into the zip: the header page,
+    then each question page as it is added, then the section properties.
+
+        with StreamingDocxWriter("bank.docx") as writer:
+            for question in questions:
+                writer.add_question(question)
+
+    If the block raises, the document is aborted: a file path output is
+    deleted, a stream is left without a zip directory (not a valid DOCX).
+    """
+
+    def __init__(self, output: Union[str, IO[bytes]]):
+        self.output = output
+        self.count = 0
+        self._formatter = DocxFormatter()
+        self._file: Optional[IO[bytes]] = None
+        self._zip = None
+        self._document = None
+        self._tail = b""
+        self._remaining = []
+
+    def __enter__(self) -> "StreamingDocxWriter":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def open(self):
+        base = BytesIO()
+        self._formatter.render([], base)
+        base_zip = ZipFile(base)
+        document = base_zip.read(_DOCUMENT_PART)
+        split = document.rfind(b"<w:sectPr")
+        head, self._tail = document[:split], document[split:]
+
+        # Same part order as the base; parts after document.xml are written once it is finished
+        parts = base_zip.namelist()
+        index = parts.index(_DOCUMENT_PART)
+        # A path is opened here so that abort() can drop it without finishing the zip
+        if isinstance(self.output, str):
+            self._file = open(self.output, "wb")
+        self._zip = ZipFile(self._file or self.output, "w", ZIP_DEFLATED)
+        for name in parts[:index]:
+            self._zip.writestr(name, base_zip.read(name))
+        self._remaining = [(name, base_zip.read(name)) for name in parts[index + 1:]]
+        self._document = self._zip.open(_DOCUMENT_PART, "w", force_zip64=True)
+        self._document.write(head)
+
+    def add_question(self, question: Dict[str, Any]):
+        self.count += 1
+        for element in self._formatter.question_page_elements(question, self.count):
+            xml = etree.tostring(element, encoding="UTF-8")
+            tag_end = xml.index(b">")
+            self._document.write(_NS_DECLARATION.sub(b"", xml[:tag_end]) + xml[tag_end:])
+
+    def write_all(self, questions: Iterable[Dict[str, Any]]) -> int:
+        """Add every question from an iterable (e.g. a pipeline generator); returns the total so far"""
+        for question in questions:
+            self.add_question(question)
+        return self.count
+
+    def close(self):
+        if self._zip is None:
+            return
+        self._document.write(self._tail)
+        self._document.close()
+        for name, data in self._remaining:
+            self._zip.writestr(name, data)
+        self._zip.close()
+        self._zip = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        record_document(self.count)
+        print(f"✅ Streamed {self.output if isinstance(self.output, str) else 'DOCX stream'} "
+              f"({self.count} questions)")
+
+
+    def abort(self):
+        """Stop without writing the closing parts; a file path output is deleted"""
+        if self._zip is None:
+            return
+        # The zip is never closed: its central directory is what would make the partial file look complete.
+        # Detaching fp also keeps ZipFile.__del__ from writing it.
+        self._document.close()
+        self._zip.fp = None
+        self._zip = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self.output)
+
+
+def write_docx_stream(questions: Iterable[Dict[str, Any]], output: Union[str, IO[bytes]]) -> int:
+    """Stream questions into a Bakeer DOCX; returns how many were written"""
+    with StreamingDocxWriter(output) as writer:
+        return writer.write_all(questions)
+
+
+def benchmark_docx_stream(counts: Iterable[int] = (250, 1000, 4000)):
+    """Peak traced memory of DocxFormatter vs StreamingDocxWriter as the question count grows"""
+    def questions(count):
+        for i in range(1, count + 1):
+            yield {
+                "question_text": f"Question text number {i}: what is {i} + {i}?",
+                "options": {"A": str(2 * i), "B": str(i), "C": str(3 * i), "D": str(i + 1)},
+                "correct_answer": "A"
+            }
+
+    for count in counts:
+        for name, render in (("formatter", lambda out: DocxFormatter().create_bakeer_docx(list(questions(count)), out)),
+                             ("streaming", lambda out: write_docx_stream(questions(count), out))):
+            with tempfile.TemporaryFile() as output:
+                tracemalloc.start()
+                start = time.perf_counter()
+                render(output)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            print(f"{count:6d} questions  {name:9s} {elapsed:6.2f}s  {peak / 1e6:7.1f} MB peak")
+
+
+if __name__ == "__main__":
+    benchmark_docx_stream()
@@ -1,35 +1,202 @@
-"""Gemini API Client with retry logic"""
-
-import google.generativeai as genai
-import time
-from typing import Dict, Any, Optional
-from src.ocr_tech.config import settings
-import logging
-
-logger = logging.getLogger(__name__)
-genai.configure(api_key=settings.GEMINI_API_KEY)
-
-class GeminiClient:
-    def __init__(self, model: str = "gemini-2.0-flash"):
-        self.model_name = model
-        self.model = genai.GenerativeModel(model)
-        logger.info(f"✅ Gemini {model} initialized")
-    
-    def generate(self, prompt: str, max_tokens: int = 2000) -> str:
-        """Generate with retry logic"""
-        for attempt in range(3):
-            try:
-                response = self.model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.3,
-                        "max_output_tokens": max_tokens
-                    }
-                )
-                return response.text.strip()
-            except Exception as e:
-                logger.warning(f"Attempt {attempt+1} failed: {e}")
-                if attempt == 2:
-                    raise
-                time.sleep(1)
-        return ""
+"""Gemini API Client with retry logic"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Tuple
+from src.ocr_tech.config import settings
+from .cache import SQLiteCache
+from .metrics import counter, gauge, histogram
+from .rate_limiter import ConcurrencyLimit, TokenBucket, backoff_delay
+from .tracing import current_span, span
+import logging
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUESTS = counter("llm_requests_total", "Gemini API requests by model and outcome (ok/error)")
+LLM_RETRIES = counter("llm_retries_total", "Gemini requests retried after an error")
+LLM_TOKENS = counter("llm_tokens_total", "Tokens reported by Gemini usage metadata, by direction (in/out)")
+LLM_CACHE = counter("llm_cache_requests_total", "LLM response cache lookups by result (hit/miss)")
+LLM_SECONDS = histogram("llm_request_seconds", "Gemini API request latency by model")
+LLM_IN_FLIGHT = gauge("llm_requests_in_flight", "Gemini API requests currently in flight")
+
+# google.generativeai is imported and configured on first client creation, not at import
+_genai = None
+_genai_lock = threading.Lock()
+
+def _get_genai():
+    global _genai
+    with _genai_lock:
+        if _genai is None:
+            if not settings.GEMINI_API_KEY:
+                raise RuntimeError("GEMINI_API_KEY is not set (environment or .env)")
+            import google.generativeai as genai
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            _genai = genai
+        return _genai
+
+# Rate limits apply per API key, so every client in the process shares the buckets
+_buckets_lock = threading.Lock()
+_buckets: Optional[Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = None
+
+def _rate_limits() -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+    """(requests-per-minute bucket, tokens-per-minute bucket); None where unlimited"""
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            rpm, tpm = settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_TOKENS_PER_MINUTE
+            _buckets = (TokenBucket(rpm) if rpm else None, TokenBucket(tpm) if tpm else None)
+        return _buckets
+
+class GeminiClient:
+    def __init__(self, model: str = "gemini-2.0-flash", use_cache: Optional[bool] = None,
+                 max_concurrency: Optional[int] = None):
+        self.model_name = model
+        self.model = _get_genai().GenerativeModel(model)
+        self.max_attempts = settings.LLM_MAX_ATTEMPTS
+        self.max_concurrency = max_concurrency or settings.LLM_MAX_CONCURRENCY
+        # One cap for the client, whichever threads and event loops its calls run on
+        self._concurrency = ConcurrencyLimit(self.max_concurrency)
+
+        use_cache = settings.LLM_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = None
+        if use_cache:
+            self.cache = SQLiteCache(
+                settings.LLM_CACHE_PATH,
+                settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+                ttl_seconds=settings.LLM_CACHE_TTL_HOURS * 3600
+            )
+        logger.info(f"✅ Gemini {model} initialized")
+
+    def generate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.3,
+                 cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """Generate with retry logic (answered from the response cache when possible)
+
+        At most max_concurrency requests are in flight, sync and async
+        calls together, however many threads call this.
+        cacheable: responses it rejects (e.g. unparseable JSON) are returned
+        but not cached, so the next call asks the model again.
+        """
+        key = self._cache_key(prompt, max_tokens, temperature)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        for attempt in range(self.max_attempts):
+            requests, tokens = _rate_limits()
+            if requests:
+                requests.acquire()
+            if tokens:
+                tokens.acquire(_estimate_tokens(prompt))
+            try:
+                with self._concurrency.hold(), LLM_IN_FLIGHT.track_inprogress(), \
+                        LLM_SECONDS.time(model=self.model_name), \
+                        span("gemini.request", model=self.model_name, attempt=attempt + 1):
+                    response = self.model.generate_content(
+                        prompt,
+                        generation_config=self._generation_config(max_tokens, temperature)
+                    )
+                text = self._response_text(response)
+            except Exception as e:
+                LLM_REQUESTS.inc(model=self.model_name, outcome="error")
+                logger.warning(f"Attempt {attempt+1} failed: {e}")
+                if attempt == self.max_attempts - 1:
+                    raise
+                LLM_RETRIES.inc(model=self.model_name)
+                time.sleep(self._retry_delay(attempt, e))
+            else:
+                self._cache_set(key, text, cacheable)
+                return text
+        return ""
+
+    async def generate_async(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.3,
+                             cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        """Async generate: rate-limited and retried with backoff, like generate()
+
+        Shares generate()'s max_concurrency cap on requests in flight.
+        """
+        key = self._cache_key(prompt, max_tokens, temperature)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        for attempt in range(self.max_attempts):
+            requests, tokens = _rate_limits()
+            if requests:
+                await requests.acquire_async()
+            if tokens:
+                await tokens.acquire_async(_estimate_tokens(prompt))
+            try:
+                async with self._concurrency.hold_async():
+                    with LLM_IN_FLIGHT.track_inprogress(), LLM_SECONDS.time(model=self.model_name), \
+                            span("gemini.request", model=self.model_name, attempt=attempt + 1):
+                        response = await self.model.generate_content_async(
+                            prompt,
+                            generation_config=self._generation_config(max_tokens, temperature)
+                        )
+                text = self._response_text(response)
+            except Exception as e:
+                LLM_REQUESTS.inc(model=self.model_name, outcome="error")
+                logger.warning(f"Attempt {attempt+1} failed: {e}")
+                if attempt == self.max_attempts - 1:
+                    raise
+                LLM_RETRIES.inc(model=self.model_name)
+                await asyncio.sleep(self._retry_delay(attempt, e))
+            else:
+                self._cache_set(key, text, cacheable)
+                return text
+        return ""
+
+    def _generation_config(self, max_tokens: int, temperature: float) -> Dict[str, Any]:
+        return {
+            "temperature": temperature,
+            "max_output_tokens": max_tokens
+        }
+
+    def _response_text(self, response: Any) -> str:
+        """The response text; raises (and counts as an error) for blocked or empty candidates"""
+        text = response.text.strip()
+        LLM_REQUESTS.inc(model=self.model_name, outcome="ok")
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, model=self.model_name, direction="in")
+            LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, model=self.model_name, direction="out")
+        return text
+
+    def _retry_delay(self, attempt: int, error: BaseException) -> float:
+        return backoff_delay(attempt, settings.LLM_BACKOFF_BASE_SECONDS, settings.LLM_BACKOFF_MAX_SECONDS, error)
+
+    def _cache_key(self, prompt: str, max_tokens: int, temperature: float) -> Optional[str]:
+        """Everything that shapes the response: model, rendered prompt and sampling settings"""
+        if self.cache is None:
+            return None
+        payload = json.dumps({
+            "model": self.model_name,
+            "prompt": prompt,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: Optional[str]) -> Optional[str]:
+        if key is None:
+            return None
+        cached = self.cache.get(key)
+        LLM_CACHE.inc(result="miss" if cached is None else "hit")
+        current_span().set(cached=cached is not None)
+        return None if cached is None else cached.decode("utf-8")
+
+    def _cache_set(self, key: Optional[str], text: str, cacheable: Optional[Callable[[str], bool]]):
+        # A response that has been paid for is returned even if it can't be cached
+        if not key or not text or (cacheable is not None and not cacheable(text)):
+            return
+        try:
+            self.cache.set(key, text.encode("utf-8"))
+        except Exception as e:
+            logger.warning(f"Could not cache Gemini response: {e}")
+
+def _estimate_tokens(prompt: str) -> int:
+    """Rough input-token count (~4 characters per token) for the tokens-per-minute bucket"""
+    return len(prompt) // 4 + 1
@@ -0,0 +1,141 @@
+"""Image preprocessing before OCR - grayscale, margin crop, downscale, deskew"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from src.ocr_tech.config import settings
+
+
+class ImagePreprocessor:
+    def __init__(self, grayscale: bool = True, crop: bool = True, deskew: bool = False,
+                 target_long_edge: int = 2000, crop_padding: int = 16, max_skew: float = 10.0):
+        """Shrinks a rendered page to the pixels OCR actually needs
+
+        target_long_edge=0 disables downscaling; pages are never upscaled.
+        Deskew only corrects angles up to max_skew degrees.
+        """
+        self.grayscale = grayscale
+        self.crop = crop
+        self.deskew = deskew
+        self.target_long_edge = target_long_edge
+        self.crop_padding = crop_padding
+        self.max_skew = max_skew
+
+    @classmethod
+    def from_settings(cls) -> "ImagePreprocessor":
+        return cls(deskew=settings.OCR_DESKEW, target_long_edge=settings.OCR_TARGET_LONG_EDGE)
+
+    def config(self) -> Dict[str, Any]:
+        """Everything that changes the output image (part of the OCR cache key)"""
+        return {
+            "grayscale": self.grayscale,
+            "crop": self.crop,
+            "deskew": self.deskew,
+            "target_long_edge": self.target_long_edge,
+            "crop_padding": self.crop_padding,
+            "max_skew": self.max_skew
+        }
+
+    def process(self, image: np.ndarray) -> Dict[str, Any]:
+        """Returns {"image", "transform", "timings"}
+
+        transform is the 3x3 matrix taking original page coordinates to
+        processed-image coordinates (see map_lines to go back); timings
+        holds seconds per step.
+        """
+        timings = {}
+        transform = np.eye(3)
+
+        start = time.perf_counter()
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        out = gray if self.grayscale else image
+        timings["grayscale"] = time.perf_counter() - start
+
+        ink = None
+        if self.crop or self.deskew:
+            start = time.perf_counter()
+            _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+            timings["threshold"] = time.perf_counter() - start
+
+        if self.crop:
+            start = time.perf_counter()
+            box = self._content_box(ink)
+            if box is not None:
+                x0, y0, x1, y1 = box
+                out, ink = out[y0:y1, x0:x1], ink[y0:y1, x0:x1]
+                transform = _translation(-x0, -y0) @ transform
+            timings["crop"] = time.perf_counter() - start
+
+        if self.target_long_edge:
+            start = time.perf_counter()
+            height, width = out.shape[:2]
+            scale = self.target_long_edge / max(height, width)
+            if scale < 1:
+                size = (max(1, round(width * scale)), max(1, round(height * scale)))
+                out = cv2.resize(out, size, interpolation=cv2.INTER_AREA)
+                if ink is not None:
+                    ink = cv2.resize(ink, size, interpolation=cv2.INTER_NEAREST)
+                transform = np.diag([size[0] / width, size[1] / height, 1.0]) @ transform
+            timings["downscale"] = time.perf_counter() - start
+
+        if self.deskew:
+            start = time.perf_counter()
+            angle = self._skew_angle(ink)
+            if angle:
+                height, width = out.shape[:2]
+                rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+                fill = 255 if out.ndim == 2 else (255, 255, 255)
+                out = cv2.warpAffine(out, rotation, (width, height),
+                                     flags=cv2.INTER_LINEAR, borderValue=fill)
+                transform = np.vstack([rotation, [0, 0, 1]]) @ transform
+            timings["deskew"] = time.perf_counter() - start
+
+        return {"image": np.ascontiguousarray(out), "transform": transform, "timings": timings}
+
+    def _content_box(self, ink: np.ndarray) -> Optional[List[int]]:
+        """[x0, y0, x1, y1] around the rows/columns that hold ink, padded; None for a blank page"""
+        height, width = ink.shape
+        # A few stray pixels (scan dust, page edges) don't count as content
+        rows = np.flatnonzero(np.count_nonzero(ink, axis=1) > max(2, width // 500))
+        cols = np.flatnonzero(np.count_nonzero(ink, axis=0) > max(2, height // 500))
+        if not len(rows) or not len(cols):
+            return None
+        pad = self.crop_padding
+        return [max(0, cols[0] - pad), max(0, rows[0] - pad),
+                min(width, cols[-1] + 1 + pad), min(height, rows[-1] + 1 + pad)]
+
+    def _skew_angle(self, ink: np.ndarray) -> float:
+        """Rotation (degrees, counter-clockwise) that levels the text; 0 when unsure"""
+        # Half resolution is plenty for the angle and keeps minAreaRect's point set small
+        if max(ink.shape) > 1000:
+            ink = cv2.resize(ink, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        points = cv2.findNonZero(ink)
+        if points is None or len(points) < 100:
+            return 0.0
+        angle = cv2.minAreaRect(points)[-1]
+        # minAreaRect's angle convention differs between OpenCV versions; fold into (-45, 45]
+        while angle > 45:
+            angle -= 90
+        while angle <= -45:
+            angle += 90
+        if abs(angle) < 0.1 or abs(angle) > self.max_skew:
+            return 0.0
+        return angle
+
+
+def map_lines(lines: List[Any], transform: np.ndarray) -> List[Any]:
+    """Raw OCR lines found on a processed image → same lines in original page coordinates"""
+    if not lines:
+        return lines
+    boxes = np.array([line[0] for line in lines], dtype=np.float64).reshape(-1, 4, 2)
+    points = np.concatenate([boxes, np.ones((*boxes.shape[:2], 1))], axis=2)
+    original = points @ np.linalg.inv(transform).T
+    boxes = (original[..., :2] / original[..., 2:]).tolist()
+    return [[box, list(line[1])] for box, line in zip(boxes, lines)]
+
+
+def _translation(dx: float, dy: float) -> np.ndarray:
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
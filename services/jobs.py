@@ -0,0 +1,190 @@
+"""Background PDF jobs - a worker pool running the pipeline, with progress and event streams"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from src.ocr_tech.config import settings
+from .artifact_store import ArtifactStore
+from .document_formatter import DocxFormatter
+from .tracing import span, trace_job
+
+logger = logging.getLogger(__name__)
+
+_TERMINAL_EVENTS = ("done", "failed")
+
+
+class Job:
+    def __init__(self, pdf_path: str, filename: str):
+        self.id = str(uuid.uuid4())
+        self.pdf_path = pdf_path
+        self.filename = filename
+        self.status = "queued"
+        self.pages_total = None
+        self.pages_done = 0
+        self.questions: List[Dict[str, Any]] = []
+        self.artifact_id = None
+        self.error = None
+        # Pages that failed in a job that still finished: its questions and DOCX are partial
+        self.failed_pages: List[int] = []
+        self.created = time.time()
+        self.finished = None
+        # Every event ever published, so late subscribers can replay from any point
+        self.events: List[Dict[str, Any]] = []
+        self._waiters = set()
+        self._lock = threading.Lock()
+
+    def publish(self, kind: str, **data):
+        """Record an event and wake every stream() waiting on this job (callable from any thread)"""
+        with self._lock:
+            event = {"id": len(self.events), "event": kind, "data": data}
+            self.events.append(event)
+            waiters = list(self._waiters)
+        for loop, flag in waiters:
+            loop.call_soon_threadsafe(flag.set)
+
+    async def stream(self, start: int = 0, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Events from index `start` on as they are published, ending after done/failed
+
+        Yields None after `keepalive` seconds without news so the caller
+        can keep the connection alive.
+        """
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            cursor = start
+            while True:
+                flag.clear()
+                with self._lock:
+                    new = self.events[cursor:]
+                for event in new:
+                    yield event
+                    if event["event"] in _TERMINAL_EVENTS:
+                        return
+                cursor += len(new)
+                if not new:
+                    try:
+                        await asyncio.wait_for(flag.wait(), keepalive)
+                    except asyncio.TimeoutError:
+                        yield None
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "pages_total": self.pages_total,
+            "pages_done": self.pages_done,
+            "questions_found": len(self.questions),
+            "error": self.error,
+            "failed_pages": self.failed_pages,
+            "download_url": f"/download/{self.artifact_id}" if self.artifact_id else None
+        }
+
+
+class JobManager:
+    def __init__(self, workers: Optional[int] = None, artifacts: Optional[ArtifactStore] = None,
+                 processor_factory: Optional[Callable[[], Any]] = None, max_finished: int = 200):
+        """Runs submitted PDFs through the pipeline, `workers` documents at a time
+
+        The QuestionProcessor (models, stage pools) is built on first use
+        and shared by all jobs. Each job's DOCX goes to `artifacts` under
+        the job id.
+        """
+        self.workers = workers or settings.JOB_WORKERS
+        self.artifacts = artifacts or ArtifactStore()
+        self.max_finished = max_finished
+        self.jobs: Dict[str, Job] = {}
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="job")
+        self._processor_factory = processor_factory
+        self._processor = None
+        self._processor_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def submit(self, pdf_path: str, filename: str) -> Job:
+        """Queue a PDF (the file is deleted once processed); returns immediately"""
+        job = Job(pdf_path, filename)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        job.publish("status", status=job.status)
+        self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: Job):
+        # TRACE_DIR set: one trace per job, pipeline and DOCX export included
+        trace_path = os.path.join(settings.TRACE_DIR, f"{job.id}.trace.json") if settings.TRACE_DIR else None
+        try:
+            with trace_job(trace_path, name=job.filename), span("document", job_id=job.id) as document:
+                processor = self._get_processor()
+                job.status = "running"
+                job.pages_total = processor.pdf.page_count(job.pdf_path)
+                job.publish("status", status=job.status, pages_total=job.pages_total)
+
+                for page in processor.stream_pdf(job.pdf_path):
+                    if page.get("error"):
+                        job.failed_pages.append(page["page"])
+                    for question in page["questions"]:
+                        job.questions.append(question)
+                        job.publish("question", page=page["page"], number=len(job.questions), question=question)
+                    job.pages_done += 1
+                    job.publish("progress", page=page["page"], pages_done=job.pages_done,
+                                pages_total=job.pages_total, questions_found=len(job.questions))
+                if job.failed_pages and getattr(processor, "checkpoints", None) is not None:
+                    # The other pages are checkpointed: uploading the same PDF again only redoes these
+                    raise RuntimeError(f"Pages {job.failed_pages} failed; submit the PDF again to retry them")
+                if job.failed_pages:
+                    # No checkpoints to resume from: deliver what was extracted, marked as partial
+                    logger.warning(f"Job {job.id}: pages {job.failed_pages} failed and were skipped")
+
+                self.artifacts.create(job.id, "Bakeer_Academy_Questions.docx",
+                                      lambda f: DocxFormatter().create_bakeer_docx(job.questions, f))
+                document.set(pages=job.pages_done, questions=len(job.questions))
+            job.artifact_id = job.id
+            job.status = "done"
+            job.finished = time.time()
+            job.publish("done", **job.to_dict())
+            logger.info(f"Job {job.id}: {len(job.questions)} questions from {job.pages_done} pages "
+                        f"in {job.finished - job.created:.1f}s")
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+            job.finished = time.time()
+            job.publish("failed", **job.to_dict())
+        finally:
+            try:
+                os.remove(job.pdf_path)
+            except OSError:
+                pass
+
+    def _get_processor(self):
+        with self._processor_lock:
+            if self._processor is None:
+                if self._processor_factory is None:
+                    from .question_processor import QuestionProcessor
+                    self._processor_factory = QuestionProcessor
+                self._processor = self._processor_factory()
+            return self._processor
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (lock held)"""
+        finished = sorted((job for job in self.jobs.values() if job.finished), key=lambda job: job.finished)
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job.id]
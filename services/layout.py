@@ -0,0 +1,219 @@
+"""Layout analysis - columns, reading order and per-question segments from OCR blocks"""
+
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from .ocr_blocks import PageBlocks
+from .ocr_utils import QUESTION_START
+
+# A block wider than this share of the text area can't sit inside one column
+_SPANNING_RATIO = 0.55
+# Fewer blocks than this beside a gap means option cells, not a column
+_MIN_COLUMN_BLOCKS = 6
+
+Blocks = Union[PageBlocks, List[Dict[str, Any]]]
+
+
+def detect_gutters(blocks: Blocks, min_gap_ratio: float = 0.03) -> List[float]:
+    """x positions of the vertical gutters between text columns
+
+    Candidate gaps come from merging the x-ranges of narrow blocks; a gap
+    only counts as a gutter if almost no block (wide ones included)
+    crosses it and both sides hold a real column's worth of blocks, so
+    option rows like "A) 1   B) 2" don't split a column.
+    """
+    blocks = PageBlocks.coerce(blocks)
+    if len(blocks) < 4:
+        return []
+    bounds = blocks.bounds
+    x0s, x1s = bounds[:, 0], bounds[:, 2]
+    left, right = float(x0s.min()), float(x1s.max())
+    width = right - left
+    if width <= 0:
+        return []
+
+    is_narrow = x1s - x0s < _SPANNING_RATIO * width
+    narrow = sorted(zip(x0s[is_narrow].tolist(), x1s[is_narrow].tolist()))
+    if not narrow:
+        return []
+
+    gaps = []
+    current_right = narrow[0][1]
+    for x0, x1 in narrow[1:]:
+        if x0 - current_right >= min_gap_ratio * width:
+            gaps.append((current_right + x0) / 2)
+        current_right = max(current_right, x1)
+
+    max_crossing = max(2, len(blocks) // 10)
+    gutters = []
+    for gap in gaps:
+        crossing = int(np.count_nonzero((x0s < gap) & (gap < x1s)))
+        left_side = int(np.count_nonzero(x1s <= gap))
+        right_side = int(np.count_nonzero(x0s >= gap))
+        if crossing <= max_crossing and min(left_side, right_side) >= _MIN_COLUMN_BLOCKS:
+            gutters.append(gap)
+    return gutters
+
+
+def reading_order(blocks: Blocks) -> List[Dict[str, Any]]:
+    """Rows of blocks in reading order: {"indices", "text", "column", "spanning"}
+
+    Blocks that cross a gutter (titles, instructions) split the page into
+    horizontal bands; inside a band each column is read top to bottom
+    before the next one. Blocks on the same text row are joined; indices
+    point into the page's blocks, left to right.
+    """
+    blocks = PageBlocks.coerce(blocks)
+    if not len(blocks):
+        return []
+    gutters = detect_gutters(blocks)
+    bounds = blocks.bounds
+    centers = blocks.centers
+    row_tolerance = 0.5 * float(np.median(bounds[:, 3] - bounds[:, 1]))
+
+    spanning, placed = [], []
+    for index, (x0, _, x1, _) in enumerate(bounds.tolist()):
+        if any(x0 < gutter < x1 for gutter in gutters):
+            spanning.append(index)
+        else:
+            column = sum(1 for gutter in gutters if gutter < centers[index, 0])
+            placed.append((column, index))
+    ys = centers[:, 1].tolist()
+    spanning.sort(key=lambda index: ys[index])
+
+    rows = []
+    band_top = float("-inf")
+    for divider in spanning + [None]:
+        band_bottom = ys[divider] if divider is not None else float("inf")
+        band = [(column, index) for column, index in placed if band_top <= ys[index] < band_bottom]
+        band.sort(key=lambda item: (item[0], ys[item[1]]))
+        rows.extend(_group_rows(blocks, band, row_tolerance))
+        if divider is not None:
+            rows.append(_row(blocks, [divider], column=-1, spanning=True))
+        band_top = band_bottom
+    return rows
+
+
+def reading_order_text(blocks: Blocks) -> str:
+    """Page text in column-aware reading order"""
+    return "\n".join(row["text"] for row in reading_order(blocks))
+
+
+def segment_questions(blocks: Blocks, min_questions: int = 2) -> List[Dict[str, Any]]:
+    """Split a page into one chunk per question
+
+    A row starting with a question number ("Q3.", "12)") opens a chunk
+    that runs until the next question start or a spanning row, carrying
+    on across a column break (a question that continues at the top of the
+    next column). Rows outside any question (instructions above the
+    first one, spanning rows, "Answer questions 1-3 using the figure")
+    are context, prefixed to each following chunk until the next context
+    rows; with no question after them they join the last chunk. No
+    block is left out.
+
+    Each chunk is {"index", "text", "context", "column", "region",
+    "blocks"}: text and blocks (PageBlocks) include the context, region is
+    [x_min, y_min, x_max, y_max] of the question's own rows in page
+    pixels. Returns [] when fewer than min_questions starts are found,
+    i.e. the page should be handled as a whole.
+    """
+    blocks = PageBlocks.coerce(blocks)
+    chunks, current, context, in_context = [], None, [], False
+    for row in reading_order(blocks):
+        if QUESTION_START.match(row["text"]):
+            current = {"column": row["column"], "rows": [row], "context": context}
+            chunks.append(current)
+            in_context = False
+        elif current is not None and not row["spanning"]:
+            current["rows"].append(row)
+        else:
+            if not in_context:
+                # A new context group: earlier chunks keep the one they were given
+                context, in_context = [], True
+            context.append(row)
+            current = None
+
+    if len(chunks) < min_questions:
+        return []
+    if in_context:
+        chunks[-1]["rows"].extend(context)
+    return [_chunk(blocks, index, chunk) for index, chunk in enumerate(chunks)]
+
+
+def _group_rows(blocks: PageBlocks, items: List[Tuple[int, int]], tolerance: float) -> List[Dict[str, Any]]:
+    """Group (column, block index) pairs sorted by column then y into text rows"""
+    ys = blocks.centers[:, 1].tolist()
+    rows, current, current_key = [], [], None
+    for column, index in items:
+        y = ys[index]
+        if current and column == current_key[0] and abs(y - current_key[1]) <= tolerance:
+            current.append(index)
+            continue
+        if current:
+            rows.append(_row(blocks, current, column=current_key[0]))
+        current, current_key = [index], (column, y)
+    if current:
+        rows.append(_row(blocks, current, column=current_key[0]))
+    return rows
+
+
+def _row(blocks: PageBlocks, indices: Sequence[int], column: int, spanning: bool = False) -> Dict[str, Any]:
+    xs = blocks.centers[:, 0]
+    indices = sorted(indices, key=lambda index: xs[index])
+    return {
+        "indices": indices,
+        "text": " ".join(blocks.texts[index] for index in indices),
+        "column": column,
+        "spanning": spanning
+    }
+
+
+def _chunk(blocks: PageBlocks, index: int, chunk: Dict[str, Any]) -> Dict[str, Any]:
+    own = [i for row in chunk["rows"] for i in row["indices"]]
+    context_indices = [i for row in chunk["context"] for i in row["indices"]]
+    bounds = blocks.bounds[own]
+    context = "\n".join(row["text"] for row in chunk["context"])
+    question = "\n".join(row["text"] for row in chunk["rows"])
+    return {
+        "index": index,
+        "text": f"{context}\n{question}" if context else question,
+        "context": context,
+        "column": chunk["column"],
+        "region": [
+            float(bounds[:, 0].min()), float(bounds[:, 1].min()),
+            float(bounds[:, 2].max()), float(bounds[:, 3].max())
+        ],
+        "blocks": blocks.take(np.array(context_indices + own, dtype=np.intp))
+    }
+
+
+def test_segment_questions():
+    def block(text, x, y, width=300):
+        bbox = [[x, y], [x + width, y], [x + width, y + 20], [x, y + 20]]
+        return {"text": text, "bbox": bbox, "confidence": 0.99}
+
+    # Two columns under a full-width instruction; question 2 runs from column 1 into column 2
+    blocks = [
+        block("Answer questions 1-3 using the table below", 50, 50, 900),
+        block("1) Which value is largest?", 50, 100), block("A) 1  B) 2", 50, 140),
+        block("C) 3  D) 4", 50, 180), block("2) What is the total", 50, 220),
+        block("of the first row", 50, 260), block("and the second row?", 50, 300),
+        block("A) 10  B) 12", 600, 100), block("C) 14  D) 16", 600, 140),
+        block("3) Which row is empty?", 600, 180), block("A) row 1", 600, 220),
+        block("B) row 2", 600, 260), block("C) row 3  D) none", 600, 300),
+        block("Turn over", 50, 400, 900)
+    ]
+    chunks = segment_questions(PageBlocks.from_dicts(blocks))
+    assert [chunk["text"].split("\n")[1][:2] for chunk in chunks] == ["1)", "2)", "3)"]
+    assert all(chunk["context"] == "Answer questions 1-3 using the table below" for chunk in chunks)
+    assert "A) 10  B) 12" in chunks[1]["text"] and "C) 14  D) 16" in chunks[1]["text"]
+    assert chunks[2]["text"].endswith("Turn over")
+    # Every non-empty block reaches some chunk
+    chunked = {text for chunk in chunks for text in chunk["blocks"].texts}
+    assert all(block["text"] in chunked for block in blocks if block["text"].strip())
+    print("✅ Question segmentation OK")
+
+
+if __name__ == "__main__":
+    test_segment_questions()
@@ -1,62 +1,135 @@
-"""LLM Agents for MCQ extraction"""
-
-from .gemini_client import GeminiClient
-from .prompts import get_prompt
-from typing import Dict, Any, List
-import json
-import logging
-import re
-
-logger = logging.getLogger(__name__)
-
-class MCQAgent:
-    def __init__(self):
-        self.client = GeminiClient()
-    
-    def classify_question(self, text: str) -> Dict[str, Any]:
-        """Classify if text contains valid MCQ"""
-        prompt = get_prompt("classification", text=text)
-        response = self.client.generate(prompt)
-        
-        try:
-            result = json.loads(response)
-            logger.info(f"Classified: {result.get('question_type')}")
-            return result
-        except:
-            return {"is_valid_mcq": False, "confidence": 0.0}
-    
-    def extract_mcq(self, text: str) -> Dict[str, Any]:
-        """Extract structured MCQ from text"""
-        prompt = get_prompt("extraction", text=text)
-        response = self.client.generate(prompt)
-        
-        try:
-            result = json.loads(response)
-            logger.info(f"Extracted Q{result.get('question_number', '?')}")
-            return result
-        except:
-            return {"question_text": text, "confidence": 0.3}
-    
-    def validate_extraction(self, question_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Validate extracted question"""
-        prompt = get_prompt("validation", question_data=json.dumps(question_data))
-        response = self.client.generate(prompt)
-        
-        try:
-            result = json.loads(response)
-            return result
-        except:
-            return {"is_valid": True, "confidence": 0.8}
-
-def test_llm_agents():
-    """Test LLM agents"""
-    agent = MCQAgent()
-    sample_text = "Q1. Find 3/7 ÷ 3/7 = A) 1 B) Zero C) -1 D) -9/4"
-    
-    print("🧪 Testing LLM Classification...")
-    classification = agent.classify_question(sample_text)
-    print(f"✅ Classification: {classification}")
-    
-    print("\n🧪 Testing LLM Extraction...")
-    extraction = agent.extract_mcq(sample_text)
-    print(f"✅ Extraction: Q{classification.get('question_number', '?')}")
+"""LLM Agents for MCQ extraction"""
+
+from .gemini_client import GeminiClient
+from .metrics import counter, histogram
+from .prompts import get_prompt
+from .shared import get_llm_client
+from .tracing import span
+from typing import Dict, Any, List, Optional
+import json
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+AGENT_CALLS = counter("mcq_agent_calls_total", "MCQAgent LLM calls by task")
+AGENT_SECONDS = histogram("mcq_agent_seconds", "MCQAgent call latency by task, cache hits included")
+PARSE_FAILURES = counter("mcq_agent_parse_failures_total", "LLM responses that were not valid JSON, by task")
+
+class MCQAgent:
+    def __init__(self, client: Optional[GeminiClient] = None):
+        """Uses the process-wide Gemini client unless given one"""
+        self.client = client or get_llm_client()
+    
+    def classify_question(self, text: str) -> Dict[str, Any]:
+        """Classify if text contains valid MCQ"""
+        prompt = get_prompt("classification", text=text)
+        return self._parse_classification(self._generate("classification", prompt))
+    
+    def extract_mcq(self, text: str) -> Dict[str, Any]:
+        """Extract structured MCQ from text"""
+        prompt = get_prompt("extraction", text=text)
+        return self._parse_extraction(self._generate("extraction", prompt), text)
+    
+    def classify_and_extract(self, text: str) -> Dict[str, Any]:
+        """Classify and extract in one request: {"classification": ..., "question": ... or None}"""
+        prompt = get_prompt("classify_extract", text=text)
+        return self._parse_combined(self._generate("classify_extract", prompt))
+    
+    def validate_extraction(self, question_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate extracted question"""
+        prompt = get_prompt("validation", question_data=json.dumps(question_data))
+        return self._parse_validation(self._generate("validation", prompt))
+    
+    # Async variants: same prompts and parsing, via GeminiClient.generate_async
+    # (for async callers; QuestionProcessor uses the sync methods from its thread pools)
+    
+    async def classify_question_async(self, text: str) -> Dict[str, Any]:
+        prompt = get_prompt("classification", text=text)
+        return self._parse_classification(await self._generate_async("classification", prompt))
+    
+    async def extract_mcq_async(self, text: str) -> Dict[str, Any]:
+        prompt = get_prompt("extraction", text=text)
+        return self._parse_extraction(await self._generate_async("extraction", prompt), text)
+    
+    async def classify_and_extract_async(self, text: str) -> Dict[str, Any]:
+        prompt = get_prompt("classify_extract", text=text)
+        return self._parse_combined(await self._generate_async("classify_extract", prompt))
+    
+    async def validate_extraction_async(self, question_data: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = get_prompt("validation", question_data=json.dumps(question_data))
+        return self._parse_validation(await self._generate_async("validation", prompt))
+    
+    def _generate(self, task: str, prompt: str) -> str:
+        AGENT_CALLS.inc(task=task)
+        with AGENT_SECONDS.time(task=task), span(f"llm.{task}", prompt_chars=len(prompt)) as call:
+            response = self.client.generate(prompt, cacheable=_is_json)
+            call.set(response_chars=len(response))
+            return response
+    
+    async def _generate_async(self, task: str, prompt: str) -> str:
+        AGENT_CALLS.inc(task=task)
+        with AGENT_SECONDS.time(task=task), span(f"llm.{task}", prompt_chars=len(prompt)) as call:
+            response = await self.client.generate_async(prompt, cacheable=_is_json)
+            call.set(response_chars=len(response))
+            return response
+    
+    def _parse_classification(self, response: str) -> Dict[str, Any]:
+        try:
+            result = json.loads(response)
+            logger.info(f"Classified: {result.get('question_type')}")
+            return result
+        except:
+            PARSE_FAILURES.inc(task="classification")
+            return {"is_valid_mcq": False, "confidence": 0.0}
+    
+    def _parse_extraction(self, response: str, text: str) -> Dict[str, Any]:
+        try:
+            result = json.loads(response)
+            logger.info(f"Extracted Q{result.get('question_number', '?')}")
+            return result
+        except:
+            PARSE_FAILURES.inc(task="extraction")
+            return {"question_text": text, "confidence": 0.3}
+    
+    def _parse_combined(self, response: str) -> Dict[str, Any]:
+        try:
+            result = json.loads(response)
+            question = result.pop("question", None)
+            if not result.get("is_valid_mcq", False):
+                question = None
+            logger.info(f"Classified: {result.get('question_type')}, "
+                        f"extracted Q{question.get('question_number', '?') if question else '-'}")
+            return {"classification": result, "question": question}
+        except:
+            PARSE_FAILURES.inc(task="classify_extract")
+            return {"classification": {"is_valid_mcq": False, "confidence": 0.0}, "question": None}
+    
+    def _parse_validation(self, response: str) -> Dict[str, Any]:
+        try:
+            result = json.loads(response)
+            return result
+        except:
+            PARSE_FAILURES.inc(task="validation")
+            return {"is_valid": True, "confidence": 0.8}
+
+def _is_json(response: str) -> bool:
+    """Only parseable responses are cached: a malformed one is asked for again next time"""
+    try:
+        json.loads(response)
+        return True
+    except ValueError:
+        return False
+
+def test_llm_agents():
+    """Test LLM agents"""
+    agent = MCQAgent()
+    sample_text = "Q1. Find 3/7 ÷ 3/7 = A) 1 B) Zero C) -1 D) -9/4"
+    
+    print("🧪 Testing LLM Classification...")
+    classification = agent.classify_question(sample_text)
+    print(f"✅ Classification: {classification}")
+    
+    print("\n🧪 Testing LLM Extraction...")
+    extraction = agent.extract_mcq(sample_text)
+    print(f"✅ Extraction: Q{classification.get('question_number', '?')}")
@@ -0,0 +1,221 @@
+"""Metrics - counters, gauges and histograms with a Prometheus text exporter
+
+Metrics are declared once at module level and registered in a Registry.
+While the registry is disabled (METRICS_ENABLED=false) every update is a
+single attribute check, and timers hand out a shared no-op context
+manager. Other exporters can read Registry.collect() instead of
+render_prometheus().
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.ocr_tech.config import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NOOP = nullcontext()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Registry:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.metrics: Dict[str, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.kind}")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def collect(self) -> List["_Metric"]:
+        with self._lock:
+            return list(self.metrics.values())
+
+    def reset(self):
+        for metric in self.collect():
+            metric.reset()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, registry: Optional[Registry] = None):
+        self.name = name
+        self.documentation = documentation
+        self.registry = registry or REGISTRY
+        self._values: Dict[LabelKey, Any] = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def track_inprogress(self, **labels):
+        """Context manager: +1 while the block runs"""
+        if not self.registry.enabled:
+            return _NOOP
+        return self._track(labels)
+
+    @contextmanager
+    def _track(self, labels: Dict[str, Any]) -> Iterator[None]:
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Optional[Registry] = None):
+        super().__init__(name, documentation, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        if not self.registry.enabled:
+            return
+        key = _key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last one is +Inf), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the block's duration in seconds"""
+        if not self.registry.enabled:
+            return _NOOP
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(_key(labels))
+        return state[2] if state else 0
+
+    def totals(self) -> Dict[LabelKey, Tuple[float, int]]:
+        """(sum, count) of every label set, e.g. for a per-stage time breakdown"""
+        with self._lock:
+            return {key: (total, count) for key, (_, total, count) in self._values.items()}
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._values.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    samples.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+                samples.append((f"{self.name}_sum", key, total))
+                samples.append((f"{self.name}_count", key, count))
+        return samples
+
+
+class _Timer:
+    """Plain class rather than @contextmanager: no generator per timed block"""
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+REGISTRY = Registry(enabled=settings.METRICS_ENABLED)
+
+
+def counter(name: str, documentation: str) -> Counter:
+    return REGISTRY.register(Counter(name, documentation))
+
+
+def gauge(name: str, documentation: str) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation))
+
+
+def histogram(name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, buckets))
+
+
+def render_prometheus(registry: Optional[Registry] = None) -> str:
+    """Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in (registry or REGISTRY).collect():
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            labels = ",".join(f'{label}="{_escape(text)}"' for label, text in key)
+            lines.append(f"{name}{{{labels}}} {_format(value)}" if labels else f"{name} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
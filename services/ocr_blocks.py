@@ -0,0 +1,176 @@
+"""Compact OCR blocks - one page of OCR output as NumPy arrays"""
+
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from .ocr_utils import bbox_position
+
+
+class PageBlocks:
+    """Parallel arrays for a page's text lines instead of one dict per line
+
+    boxes (N, 4, 2) float32, confidences (N,) float64 and a list of N
+    texts. Positions, confidence filtering and reading order are computed
+    on the arrays; to_dicts() builds the classic block dicts only when a
+    caller needs them, and caches the result. The pipeline (layout, noise
+    filter, checkpoints) works on PageBlocks throughout.
+    """
+
+    __slots__ = ("boxes", "confidences", "texts", "source", "_dicts")
+
+    def __init__(self, boxes: np.ndarray, confidences: np.ndarray, texts: List[str], source: str = "ocr"):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4, 2)
+        self.confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+        self.texts = list(texts)
+        self.source = source
+        self._dicts = None
+
+    @classmethod
+    def from_lines(cls, lines: List[Any], source: str = "ocr") -> "PageBlocks":
+        """From raw PaddleOCR lines: [[bbox, [text, score]], ...]"""
+        if not lines:
+            return cls.empty(source)
+        boxes = np.array([line[0] for line in lines], dtype=np.float32)
+        confidences = np.array([line[1][1] for line in lines], dtype=np.float64)
+        return cls(boxes, confidences, [line[1][0] for line in lines], source)
+
+    @classmethod
+    def from_dicts(cls, blocks: List[Dict[str, Any]], source: Optional[str] = None) -> "PageBlocks":
+        if not blocks:
+            return cls.empty(source or "ocr")
+        boxes = np.array([block["bbox"] for block in blocks], dtype=np.float32)
+        confidences = np.array([block["confidence"] for block in blocks], dtype=np.float64)
+        return cls(boxes, confidences, [block["text"] for block in blocks],
+                   source or blocks[0].get("source", "ocr"))
+
+    @classmethod
+    def empty(cls, source: str = "ocr") -> "PageBlocks":
+        return cls(np.empty((0, 4, 2), np.float32), np.empty(0, np.float64), [], source)
+
+    @classmethod
+    def coerce(cls, blocks: Union["PageBlocks", List[Dict[str, Any]]]) -> "PageBlocks":
+        """PageBlocks as they are; classic block dicts converted"""
+        return blocks if isinstance(blocks, PageBlocks) else cls.from_dicts(blocks)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def centers(self) -> np.ndarray:
+        """(N, 2) x/y centers"""
+        return self.boxes.mean(axis=1)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        """(N, 2) widths/heights"""
+        return self.boxes.max(axis=1) - self.boxes.min(axis=1)
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """(N, 4) x_min, y_min, x_max, y_max"""
+        return np.concatenate([self.boxes.min(axis=1), self.boxes.max(axis=1)], axis=1)
+
+    def take(self, indices: np.ndarray) -> "PageBlocks":
+        return PageBlocks(self.boxes[indices], self.confidences[indices],
+                          [self.texts[i] for i in np.asarray(indices).tolist()], self.source)
+
+    def filter(self, min_confidence: float) -> "PageBlocks":
+        """Lines strictly above min_confidence"""
+        return self.take(np.flatnonzero(self.confidences > min_confidence))
+
+    def reading_order(self) -> np.ndarray:
+        """Indices top to bottom (stable, like sorting dicts by y_center)"""
+        return np.argsort(self.centers[:, 1], kind="stable")
+
+    def sorted(self) -> "PageBlocks":
+        return self.take(self.reading_order())
+
+    def text(self) -> str:
+        """Page text in reading order, same as OCRService.blocks_to_text"""
+        return "\n".join(self.texts[i] for i in self.reading_order().tolist())
+
+    def to_lines(self) -> List[Any]:
+        """Back to plain PaddleOCR-style lines, [[bbox, [text, score]], ...] (JSON-able; see from_lines)"""
+        return [[bbox, [text, confidence]]
+                for bbox, text, confidence in zip(self.boxes.tolist(), self.texts, self.confidences.tolist())]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Classic block dicts ({"text", "confidence", "bbox", "position", "source"}), built once"""
+        if self._dicts is None:
+            centers = self.centers.tolist()
+            sizes = self.sizes.tolist()
+            self._dicts = [
+                {
+                    "text": text,
+                    "confidence": confidence,
+                    "bbox": bbox,
+                    "position": {
+                        "x_center": center[0],
+                        "y_center": center[1],
+                        "width": size[0],
+                        "height": size[1]
+                    },
+                    "source": self.source
+                }
+                for text, confidence, bbox, center, size in zip(
+                    self.texts, self.confidences.tolist(), self.boxes.tolist(), centers, sizes
+                )
+            ]
+        return self._dicts
+
+
+def benchmark_page_blocks(pages: int = 500, lines_per_page: int = 60, threshold: float = 0.85):
+    """Time and peak memory: per-line dicts vs PageBlocks, on synthetic OCR output"""
+    rng = np.random.default_rng(0)
+    raw_pages = []
+    for _ in range(pages):
+        origins = rng.uniform(0, 2400, size=(lines_per_page, 2))
+        sizes = rng.uniform([200, 20], [1200, 40], size=(lines_per_page, 2))
+        scores = rng.uniform(0.5, 1.0, size=lines_per_page)
+        raw_pages.append([
+            [[[x, y], [x + w, y], [x + w, y + h], [x, y + h]], [f"line {i}", float(s)]]
+            for i, ((x, y), (w, h), s) in enumerate(zip(origins.tolist(), sizes.tolist(), scores))
+        ])
+
+    def dict_path():
+        kept = []
+        for lines in raw_pages:
+            blocks = []
+            for line in lines:
+                block = {
+                    "text": line[1][0],
+                    "confidence": float(line[1][1]),
+                    "bbox": line[0],
+                    "position": bbox_position(line[0]),
+                    "source": "ocr"
+                }
+                if block["confidence"] > threshold:
+                    blocks.append(block)
+            blocks.sort(key=lambda b: b["position"]["y_center"])
+            kept.append(blocks)
+        return kept
+
+    def compact_path():
+        return [PageBlocks.from_lines(lines).filter(threshold).sorted() for lines in raw_pages]
+
+    results = {}
+    for name, run in (("dicts", dict_path), ("page_blocks", compact_path)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        kept = run()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"seconds": elapsed, "peak_mb": peak / 1e6}
+        del kept
+
+    for name, result in results.items():
+        print(f"{name:12s} {result['seconds'] * 1000:8.1f} ms  {result['peak_mb']:8.1f} MB peak")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_page_blocks()
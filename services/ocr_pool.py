@@ -0,0 +1,77 @@
+"""OCR Pool - Runs PaddleOCR in worker processes, one model per worker"""
+
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from .streaming import ordered_map
+
+logger = logging.getLogger(__name__)
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Set in each worker process by _init_worker
+_worker_service = None
+
+
+def _init_worker(cpu_threads: int, use_angle_cls: bool, rec_batch_size: int, lang: str):
+    """Runs once per worker: load the model (thread caps come from the inherited environment)"""
+    global _worker_service
+    from .ocr_service import OCRService
+    # Same engine options as the parent service; caching, preprocessing and
+    # confidence filtering happen in the parent process
+    _worker_service = OCRService(pool_size=0, cpu_threads=cpu_threads, use_angle_cls=use_angle_cls,
+                                 rec_batch_size=rec_batch_size, lang=lang, use_cache=False, preprocess=False)
+
+
+def _extract(image: Union[str, np.ndarray], use_angle_cls: Optional[bool] = None) -> Optional[List[Any]]:
+    return _worker_service.safe_ocr_lines(image, use_angle_cls)
+
+
+class OCRPool:
+    def __init__(self, workers: int, cpu_threads: int = 0, use_angle_cls: bool = True,
+                 rec_batch_size: int = 32, lang: str = "en"):
+        """Start `workers` processes; cpu_threads=0 splits the machine's cores evenly between them
+
+        use_angle_cls, rec_batch_size and lang configure each worker's
+        engine, the way they configure an in-process OCRService.
+        """
+        self.workers = workers
+        self.cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // workers)
+        # A spawned worker imports numpy (and with it BLAS) before any initializer runs, so the
+        # caps must already be in the environment it inherits. The parent's BLAS is loaded by
+        # now and keeps its own thread count.
+        for var in _THREAD_ENV_VARS:
+            os.environ[var] = str(self.cpu_threads)
+        # spawn, not fork: Paddle's thread pools do not survive a fork
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.cpu_threads, use_angle_cls, rec_batch_size, lang)
+        )
+        logger.info(f"OCR pool started: {workers} workers x {self.cpu_threads} threads")
+
+    def submit(self, image: Union[str, np.ndarray], use_angle_cls: Optional[bool] = None) -> Future:
+        """Queue one page for OCR; the future resolves to raw OCRService.ocr_lines output (None on failure)"""
+        return self.executor.submit(_extract, image, use_angle_cls)
+
+    def ocr_lines(self, image: Union[str, np.ndarray], use_angle_cls: Optional[bool] = None) -> List[Any]:
+        """Raw OCR lines for one page, computed in a worker"""
+        lines = self.submit(image, use_angle_cls).result()
+        if lines is None:
+            raise RuntimeError("OCR failed in pool worker")
+        return lines
+
+    def map(self, images: Iterable[Union[str, np.ndarray]],
+            use_angle_cls: Optional[bool] = None) -> Iterator[Optional[List[Any]]]:
+        """OCR many pages across the pool, results in input order"""
+        return ordered_map(self.executor, partial(_extract, use_angle_cls=use_angle_cls), images, self.workers * 2)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
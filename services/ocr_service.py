@@ -1,68 +1,366 @@
 ﻿"""OCR Service - Extracts text from images/PDFs using PaddleOCR"""
 
 import os
-from paddleocr import PaddleOCR
-from typing import List, Dict, Any, Tuple
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 from PIL import Image
+import cv2
+import numpy as np
 import logging
 from src.ocr_tech.config import settings
+from .cache import SQLiteCache
+from .image_preprocess import ImagePreprocessor, map_lines
+from .metrics import counter, gauge, histogram
+from .ocr_blocks import PageBlocks
+from .ocr_utils import bbox_position
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+OCR_PAGES = counter("ocr_pages_total", "Pages returned by OCRService (cache hits included)")
+OCR_BLOCKS = counter("ocr_blocks_total", "Text blocks kept above the confidence threshold")
+OCR_CACHE = counter("ocr_cache_requests_total", "OCR result cache lookups by result (hit/miss)")
+OCR_STAGE_SECONDS = histogram("ocr_stage_seconds", "Seconds per page for each preprocessing step and for OCR, by step")
+OCR_IN_FLIGHT = gauge("ocr_in_flight", "OCR engine calls (single pages or batches) currently running")
+
 
 class OCRService:
-    def __init__(self):
-        """Initialize PaddleOCR with optimized settings"""
-        # Use the default constructor to be compatible with the installed PaddleOCR
-        self.ocr = PaddleOCR()
+    def __init__(self, pool_size: Optional[int] = None, cpu_threads: Optional[int] = None,
+                 use_angle_cls: Optional[bool] = None, rec_batch_size: Optional[int] = None,
+                 use_cache: Optional[bool] = None, preprocess: Optional[bool] = None,
+                 lang: Optional[str] = None):
+        """Initialize PaddleOCR with optimized settings
+
+        pool_size > 0 runs OCR in that many worker processes instead of
+        in-process; cpu_threads caps Paddle's intra-op threads (per worker).
+        preprocess (OCR_PREPROCESS, off by default) shrinks pages
+        (ImagePreprocessor) before they reach the engine; returned boxes
+        are always in original page coordinates.
+        """
+        pool_size = settings.OCR_POOL_SIZE if pool_size is None else pool_size
+        cpu_threads = settings.OCR_CPU_THREADS if cpu_threads is None else cpu_threads
+        use_cache = settings.OCR_CACHE_ENABLED if use_cache is None else use_cache
+        preprocess = settings.OCR_PREPROCESS if preprocess is None else preprocess
+        self.use_angle_cls = settings.OCR_USE_ANGLE_CLS if use_angle_cls is None else use_angle_cls
+        self.rec_batch_size = rec_batch_size or settings.OCR_REC_BATCH_SIZE
+        self.lang = lang or settings.OCR_LANGUAGE
+
+        self.cache = None
+        if use_cache:
+            self.cache = SQLiteCache(settings.OCR_CACHE_PATH, settings.OCR_CACHE_MAX_MB * 1024 * 1024)
+
+        self.preprocessor = ImagePreprocessor.from_settings() if preprocess else None
+        # Seconds spent per step (preprocessing steps and "ocr") and pages timed per step
+        self.timings = Counter()
+        self.timed_pages = Counter()
+        self._timings_lock = threading.Lock()
+
+        self.pool = None
+        self.ocr = None
+        if pool_size > 0:
+            from .ocr_pool import OCRPool
+            self.pool = OCRPool(pool_size, cpu_threads, use_angle_cls=self.use_angle_cls,
+                                rec_batch_size=self.rec_batch_size, lang=self.lang)
+        else:
+            options = {
+                "lang": self.lang,
+                "use_angle_cls": self.use_angle_cls,
+                "rec_batch_num": self.rec_batch_size,
+                "cls_batch_num": self.rec_batch_size
+            }
+            if cpu_threads:
+                options["cpu_threads"] = cpu_threads
+            # Deferred: importing paddle costs seconds, and pooled services never need it here
+            from paddleocr import PaddleOCR
+            self.ocr = PaddleOCR(**options)
         logger.info("OCR Service initialized")
 
-    def extract_text_from_image(self, image_path: str) -> List[Dict[str, Any]]:
-        """Extract text from single image with confidence scores"""
-        try:
-            result = self.ocr.ocr(image_path, cls=True)
-            if result[0] is None:
-                return []
-
-            texts = []
-            for line in result[0]:
-                text_data = {
-                    "text": line[1][0],
-                    "confidence": float(line[1][1]),
-                    "bbox": line[0],
-                    "position": self._calculate_position(line[0])
-                }
-                if text_data["confidence"] > settings.MIN_CONFIDENCE_THRESHOLD:
-                    texts.append(text_data)
-
-            logger.info(f"Extracted {len(texts)} text blocks from {image_path}")
-            return texts
+    @property
+    def concurrency(self) -> int:
+        """How many pages can usefully be in OCR at once"""
+        return self.pool.workers if self.pool else 1
+
+    def extract_text_from_image(self, image: Union[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """Extract text from single image (path or BGR array) with confidence scores, as block dicts
 
+        A page that fails is logged and comes back empty.
+        """
+        try:
+            return self.extract_page_blocks(image).to_dicts()
         except Exception as e:
-            logger.error(f"OCR failed on {image_path}: {e}")
+            logger.error(f"OCR failed on {_describe(image)}: {e}")
             return []
 
-    def extract_full_page(self, image_path: str) -> str:
+    def extract_page_blocks(self, image: Union[str, np.ndarray]) -> PageBlocks:
+        """Like extract_text_from_image, as compact PageBlocks (no per-line dicts): what the pipeline uses
+
+        Raises when OCR fails, so callers can tell a failed page from an empty one.
+        """
+        key = self._cache_key(image, self.use_angle_cls)
+        lines = self._cache_get(key)
+        if lines is None:
+            prepared, transform = self._prepare(image)
+            start = time.perf_counter()
+            with OCR_IN_FLIGHT.track_inprogress():
+                lines = self.pool.ocr_lines(prepared) if self.pool else self.ocr_lines(prepared)
+            self._record({"ocr": time.perf_counter() - start})
+            lines = self._restore(lines, transform)
+            self._cache_set(key, lines)
+
+        blocks = self._page_blocks(lines)
+        logger.info(f"Extracted {len(blocks)} text blocks from {_describe(image)}")
+        return blocks
+
+    def extract_batch(self, images: Sequence[Union[str, np.ndarray]],
+                      use_angle_cls: Optional[bool] = None) -> List[List[Dict[str, Any]]]:
+        """extract_batch_blocks, as one list of block dicts per page (empty for failed pages)"""
+        return [blocks.to_dicts() if blocks is not None else []
+                for blocks in self.extract_batch_blocks(images, use_angle_cls)]
+
+    def extract_batch_blocks(self, images: Sequence[Union[str, np.ndarray]],
+                             use_angle_cls: Optional[bool] = None) -> List[Optional[PageBlocks]]:
+        """OCR several pages at once, one PageBlocks per page, None for a page that failed
+
+        Detection runs per page; angle classification and recognition then
+        run over the text crops of all pages together, in batches of
+        rec_batch_size, instead of one page's lines at a time.
+        use_angle_cls=False skips the angle classifier for this call; it
+        cannot turn on a classifier the service was built without.
+        Errors that stop the whole batch (a broken OCR pool) are raised.
+        """
+        use_angle_cls = self._angle_cls(use_angle_cls)
+        keys = [self._cache_key(image, use_angle_cls) for image in images]
+        lines = [self._cache_get(key) for key in keys]
+        misses = [i for i, page_lines in enumerate(lines) if page_lines is None]
+
+        if misses:
+            prepared = [self._prepare(images[i]) for i in misses]
+            start = time.perf_counter()
+            with OCR_IN_FLIGHT.track_inprogress():
+                fresh = self._batch_lines([image for image, _ in prepared], use_angle_cls)
+            self._record({"ocr": (time.perf_counter() - start) / len(misses)}, pages=len(misses))
+            for i, page_lines, (_, transform) in zip(misses, fresh, prepared):
+                # Failed pages come back as None: passed on as None, never cached
+                if page_lines is not None:
+                    page_lines = self._restore(page_lines, transform)
+                    self._cache_set(keys[i], page_lines)
+                lines[i] = page_lines
+
+        pages = [self._page_blocks(page_lines) if page_lines is not None else None for page_lines in lines]
+        failed = sum(blocks is None for blocks in pages)
+        logger.info(f"Extracted {sum(len(blocks) for blocks in pages if blocks is not None)} text blocks "
+                    f"from {len(images)} pages ({len(images) - len(misses)} from cache"
+                    + (f", {failed} failed)" if failed else ")"))
+        return pages
+
+    def ocr_lines(self, image: Union[str, np.ndarray], use_angle_cls: Optional[bool] = None) -> List[Any]:
+        """Raw, unfiltered PaddleOCR lines for one page: [[bbox, [text, score]], ...]"""
+        result = self.ocr.ocr(_as_bgr(image), cls=self._angle_cls(use_angle_cls))
+        return _plain_lines(result[0] or [])
+
+    def _angle_cls(self, use_angle_cls: Optional[bool]) -> bool:
+        """Whether a call runs the angle classifier: only if asked and the model has one"""
+        return self.use_angle_cls if use_angle_cls is None else use_angle_cls and self.use_angle_cls
+
+    def _batch_lines(self, images: Sequence[Union[str, np.ndarray]],
+                     use_angle_cls: bool) -> List[Optional[List[Any]]]:
+        """Raw lines for several pages, recognized together where the engine allows"""
+        if self.pool:
+            return list(self.pool.map(images, use_angle_cls))
+        if not hasattr(self.ocr, "text_detector"):
+            # PaddleOCR builds without the 2.x predictor attributes: page by page
+            return [self.safe_ocr_lines(image, use_angle_cls) for image in images]
+
+        try:
+            return self._recognize_batch(images, use_angle_cls)
+        except Exception as e:
+            logger.error(f"Batched OCR failed on {len(images)} pages, retrying one by one: {e}")
+            return [self.safe_ocr_lines(image, use_angle_cls) for image in images]
+
+    def _recognize_batch(self, images: Sequence[Union[str, np.ndarray]],
+                         use_angle_cls: bool) -> List[Optional[List[Any]]]:
+        crops, owners, unreadable = [], [], set()
+        for page_index, image in enumerate(images):
+            img = cv2.imread(image) if isinstance(image, str) else _as_bgr(image)
+            if img is None:
+                logger.error(f"OCR failed on {_describe(image)}: unreadable image")
+                unreadable.add(page_index)
+                continue
+            dt_boxes, _ = self.ocr.text_detector(img)
+            for box in _sorted_boxes(dt_boxes):
+                crops.append(_crop_box(img, box))
+                owners.append((page_index, box))
+
+        lines = [[] for _ in images]
+        if crops:
+            classifier = getattr(self.ocr, "text_classifier", None)
+            if use_angle_cls and classifier is not None:
+                crops, _, _ = classifier(crops)
+            rec_res, _ = self.ocr.text_recognizer(crops)
+
+            for (page_index, box), (text, score) in zip(owners, rec_res):
+                lines[page_index].append((box.tolist(), (text, score)))
+
+        logger.info(f"Recognized {len(crops)} lines across {len(images)} pages")
+        return [None if page_index in unreadable else _plain_lines(page_lines)
+                for page_index, page_lines in enumerate(lines)]
+
+    def safe_ocr_lines(self, image: Union[str, np.ndarray],
+                       use_angle_cls: Optional[bool] = None) -> Optional[List[Any]]:
+        """ocr_lines, but None (logged) instead of raising"""
+        try:
+            return self.ocr_lines(image, use_angle_cls)
+        except Exception as e:
+            logger.error(f"OCR failed on {_describe(image)}: {e}")
+            return None
+
+    def _cache_key(self, image: Union[str, np.ndarray], use_angle_cls: bool) -> Optional[str]:
+        """Hash of the page pixels plus every setting that changes raw OCR output"""
+        if self.cache is None:
+            return None
+        digest = hashlib.sha256()
+        if isinstance(image, np.ndarray):
+            digest.update(f"{image.shape}|{image.dtype}|".encode())
+            digest.update(np.ascontiguousarray(image).tobytes())
+        else:
+            with open(image, "rb") as f:
+                digest.update(f.read())
+        # The confidence threshold is deliberately absent: it is applied on read
+        digest.update(json.dumps({
+            "lang": self.lang,
+            "dpi": settings.PDF_DPI,
+            "angle_cls": use_angle_cls,
+            "preprocess": self.preprocessor.config() if self.preprocessor else None
+        }, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def _cache_get(self, key: Optional[str]) -> Optional[List[Any]]:
+        if key is None:
+            return None
+        value = self.cache.get(key)
+        OCR_CACHE.inc(result="miss" if value is None else "hit")
+        return None if value is None else json.loads(value)
+
+    def _cache_set(self, key: Optional[str], lines: List[Any]):
+        if key is not None:
+            self.cache.set(key, json.dumps(lines).encode())
+
+    def _prepare(self, image: Union[str, np.ndarray]) -> Tuple[Union[str, np.ndarray], Optional[np.ndarray]]:
+        """(image to OCR, transform from page to that image); unchanged when preprocessing is off"""
+        if self.preprocessor is None:
+            return image, None
+        img = cv2.imread(image) if isinstance(image, str) else image
+        if img is None:
+            # Let the engine report the unreadable file
+            return image, None
+        result = self.preprocessor.process(img)
+        self._record(result["timings"])
+        return result["image"], result["transform"]
+
+    def _restore(self, lines: List[Any], transform: Optional[np.ndarray]) -> List[Any]:
+        return lines if transform is None else map_lines(lines, transform)
+
+    def _record(self, timings: Dict[str, float], pages: int = 1):
+        with self._timings_lock:
+            for step, seconds in timings.items():
+                self.timings[step] += seconds * pages
+                self.timed_pages[step] += pages
+        for step, seconds in timings.items():
+            for _ in range(pages):
+                OCR_STAGE_SECONDS.observe(seconds, step=step)
+
+    def timing_report(self) -> Dict[str, float]:
+        """Average milliseconds per page for each preprocessing step and for OCR itself"""
+        with self._timings_lock:
+            return {step: 1000 * self.timings[step] / self.timed_pages[step] for step in self.timings}
+
+    def extract_full_page(self, image: Union[str, np.ndarray]) -> str:
         """Extract full readable text from page (ordered)"""
-        texts = self.extract_text_from_image(image_path)
+        return self.blocks_to_text(self.extract_text_from_image(image))
+
+    @staticmethod
+    def blocks_to_text(texts: Union[List[Dict[str, Any]], PageBlocks]) -> str:
+        """Join text blocks into page text in reading order"""
+        if isinstance(texts, PageBlocks):
+            return texts.text()
         # Sort by Y position (top to bottom)
-        texts.sort(key=lambda x: x["position"]["y_center"])
+        texts = sorted(texts, key=lambda x: x["position"]["y_center"])
 
         full_text = "\n".join([t["text"] for t in texts])
         return full_text
 
+    def _page_blocks(self, lines: List[Any]) -> PageBlocks:
+        """PaddleOCR [bbox, (text, score)] lines → blocks above the confidence threshold"""
+        blocks = PageBlocks.from_lines(lines).filter(settings.MIN_CONFIDENCE_THRESHOLD)
+        OCR_PAGES.inc()
+        OCR_BLOCKS.inc(len(blocks))
+        return blocks
+
     def _calculate_position(self, bbox: List[List[float]]) -> Dict[str, float]:
         """Calculate center position of bounding box"""
-        x_coords = [point[0] for point in bbox]
-        y_coords = [point[1] for point in bbox]
-        return {
-            "x_center": sum(x_coords) / len(x_coords),
-            "y_center": sum(y_coords) / len(y_coords),
-            "width": max(x_coords) - min(x_coords),
-            "height": max(y_coords) - min(y_coords)
-        }
+        return bbox_position(bbox)
+
+    def close(self):
+        """Stop pool workers, if any"""
+        if self.pool:
+            self.pool.shutdown()
+            self.pool = None
+
+
+def _plain_lines(lines: List[Any]) -> List[Any]:
+    """PaddleOCR lines as plain JSON-able lists (no numpy scalars)"""
+    return [
+        [[[float(x), float(y)] for x, y in bbox], [str(text), float(score)]]
+        for bbox, (text, score) in lines
+    ]
+
+
+def _sorted_boxes(dt_boxes) -> List[np.ndarray]:
+    """Detected boxes top-to-bottom, left-to-right within a text row"""
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return []
+    boxes = sorted(dt_boxes, key=lambda box: (box[0][1], box[0][0]))
+    for i in range(len(boxes) - 1):
+        for j in range(i, -1, -1):
+            same_row = abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10
+            if same_row and boxes[j + 1][0][0] < boxes[j][0][0]:
+                boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+            else:
+                break
+    return boxes
+
+
+def _crop_box(img: np.ndarray, box: np.ndarray) -> np.ndarray:
+    """Perspective-crop one detected text line, rotating tall crops upright"""
+    points = np.asarray(box, dtype=np.float32)
+    width = int(max(np.linalg.norm(points[0] - points[1]), np.linalg.norm(points[2] - points[3])))
+    height = int(max(np.linalg.norm(points[0] - points[3]), np.linalg.norm(points[1] - points[2])))
+    target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    matrix = cv2.getPerspectiveTransform(points, target)
+    crop = cv2.warpPerspective(img, matrix, (width, height),
+                               borderMode=cv2.BORDER_REPLICATE, flags=cv2.INTER_CUBIC)
+    if crop.shape[0] * 1.0 / max(1, crop.shape[1]) >= 1.5:
+        crop = np.rot90(crop)
+    return crop
+
+
+def _as_bgr(image: Union[str, np.ndarray]) -> Union[str, np.ndarray]:
+    """Paddle's detector expects 3 channels; preprocessed pages are grayscale"""
+    if isinstance(image, np.ndarray) and image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+
+def _describe(image: Union[str, np.ndarray]) -> str:
+    """Short label for log lines"""
+    if isinstance(image, np.ndarray):
+        return f"{image.shape[1]}x{image.shape[0]} image"
+    return str(image)
 
 
 # Test function
@@ -1,54 +1,126 @@
-"""OCR Utility Functions"""
-
-import re
-from typing import List, Dict, Any
-
-def detect_questions(text: str) -> List[Dict[str, Any]]:
-    """Detect potential question patterns in OCR text"""
-    question_patterns = [
-        r"Q\d+\.?\s*",
-        r"\d+\.\s*",
-        r"(Find|What|How|Which|When|Where|Why)\s",
-        r"[A-D][\)\.]?\s"
-    ]
-    
-    questions = []
-    lines = text.split("\n")
-    
-    for i, line in enumerate(lines):
-        for pattern in question_patterns:
-            if re.search(pattern, line, re.IGNORECASE):
-                questions.append({
-                    "line_number": i,
-                    "text": line.strip(),
-                    "type": "potential_question"
-                })
-                break
-    
-    return questions
-
-def clean_ocr_text(text: str) -> str:
-    """Clean common OCR errors"""
-    replacements = {
-        "O": "0",  # O → 0
-        "o": "0",
-        "l": "1",  # l → 1
-        "I": "1",
-        "|": "1",
-        "÷": "/",  # Division symbol
-        "×": "*",
-        "√": "sqrt",
-        "²": "^2",
-        "³": "^3"
-    }
-    
-    for wrong, right in replacements.items():
-        text = text.replace(wrong, right)
-    
-    return text.strip()
-
-def test_ocr_utils():
-    sample = "Q1. Find 3/7 ÷ 3/7 = A) 1 B) Zero"
-    print("🧪 Testing OCR Utils...")
-    print(f"Cleaned: {clean_ocr_text(sample)}")
-    print("✅ Utils ready!")
+"""OCR Utility Functions"""
+
+import re
+from typing import List, Dict, Any, Optional, Sequence
+
+# Compiled once at import; detect_questions and classify_page run on every page
+QUESTION_PATTERNS = [
+    re.compile(r"Q\d+\.?\s*", re.IGNORECASE),
+    re.compile(r"\d+\.\s*", re.IGNORECASE),
+    re.compile(r"(Find|What|How|Which|When|Where|Why)\s", re.IGNORECASE),
+    re.compile(r"[A-D][\)\.]?\s", re.IGNORECASE)
+]
+QUESTION_START = re.compile(r"^\s*(?:Q(?:uestion)?\s*\d{1,3}|\d{1,3})\s*[\.\):-](?!\d)", re.IGNORECASE)
+QUESTION_CUE = re.compile(r"\?|\b(?:find|what|how|which|when|where|why|calculate|choose|select)\b|=\s*$",
+                          re.IGNORECASE)
+OPTION_LABEL = re.compile(r"(?:^|[\s(\[])([A-Da-d])\s*[\)\].:]\s*(?=\S)")
+ANSWER_KEY_ENTRY = re.compile(r"\b\d{1,3}\s*[\.\):-]?\s*\(?([A-D])\)?(?=[\s,;]|$)")
+NON_MCQ_HEADINGS = re.compile(
+    r"\b(?:answer\s*key|answers|solutions|instructions|table\s+of\s+contents|contents|"
+    r"all\s+rights\s+reserved|copyright|name\s*:|roll\s*no)\b",
+    re.IGNORECASE
+)
+
+def detect_questions(text: str) -> List[Dict[str, Any]]:
+    """Detect potential question patterns in OCR text"""
+    questions = []
+    lines = text.split("\n")
+    
+    for i, line in enumerate(lines):
+        for pattern in QUESTION_PATTERNS:
+            if pattern.search(line):
+                questions.append({
+                    "line_number": i,
+                    "text": line.strip(),
+                    "type": "potential_question"
+                })
+                break
+    
+    return questions
+
+def classify_page(text: str, blocks: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+    """Cheap rule-based MCQ verdict: "mcq", "not_mcq" or "uncertain"
+
+    Only "uncertain" pages need the LLM classifier. Signals come from the
+    page text (question numbers/cues, A-D option labels, answer-key runs,
+    cover/instruction headings) and, when given, the OCR blocks (PageBlocks
+    or block dicts): options laid out as their own short blocks.
+    """
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    reasons = []
+    if sum(len(line) for line in lines) < 15:
+        return {"verdict": "not_mcq", "reasons": ["no text"]}
+
+    labels = {match.upper() for line in lines for match in OPTION_LABEL.findall(line)}
+    starts = sum(1 for line in lines if QUESTION_START.match(line))
+    cues = sum(1 for line in lines if QUESTION_CUE.search(line))
+    key_entries = sum(len(ANSWER_KEY_ENTRY.findall(line)) for line in lines)
+    headings = NON_MCQ_HEADINGS.findall(text)
+    avg_line = sum(len(line) for line in lines) / len(lines)
+
+    option_blocks = 0
+    if blocks:
+        texts = blocks.texts if hasattr(blocks, "texts") else [block["text"] for block in blocks]
+        option_blocks = sum(
+            1 for block_text in texts
+            if len(block_text) <= 40 and OPTION_LABEL.match(block_text.strip())
+        )
+
+    # Answer keys: many "12. C" style pairs on short lines, little else
+    if key_entries >= 5 and avg_line < 25 and cues == 0:
+        reasons.append(f"{key_entries} answer-key entries")
+        return {"verdict": "not_mcq", "reasons": reasons}
+
+    if not labels:
+        reasons.append("no A-D option labels")
+        if headings:
+            reasons.append("headings: " + ", ".join(h.lower() for h in headings))
+            return {"verdict": "not_mcq", "reasons": reasons}
+        if starts == 0 and cues == 0:
+            reasons.append("no question cues")
+            return {"verdict": "not_mcq", "reasons": reasons}
+        return {"verdict": "uncertain", "reasons": reasons}
+
+    if labels == {"A", "B", "C", "D"} and (starts or cues or option_blocks >= 4) and not headings:
+        reasons.append("question with options A-D")
+        return {"verdict": "mcq", "reasons": reasons}
+
+    reasons.append(f"options {''.join(sorted(labels))}, {starts} question starts, {cues} cues")
+    return {"verdict": "uncertain", "reasons": reasons}
+
+def bbox_position(bbox: List[List[float]]) -> Dict[str, float]:
+    """Calculate center position and size of a 4-point bounding box"""
+    x_coords = [point[0] for point in bbox]
+    y_coords = [point[1] for point in bbox]
+    return {
+        "x_center": sum(x_coords) / len(x_coords),
+        "y_center": sum(y_coords) / len(y_coords),
+        "width": max(x_coords) - min(x_coords),
+        "height": max(y_coords) - min(y_coords)
+    }
+
+def clean_ocr_text(text: str) -> str:
+    """Clean common OCR errors"""
+    replacements = {
+        "O": "0",  # O → 0
+        "o": "0",
+        "l": "1",  # l → 1
+        "I": "1",
+        "|": "1",
+        "÷": "/",  # Division symbol
+        "×": "*",
+        "√": "sqrt",
+        "²": "^2",
+        "³": "^3"
+    }
+    
+    for wrong, right in replacements.items():
+        text = text.replace(wrong, right)
+    
+    return text.strip()
+
+def test_ocr_utils():
+    sample = "Q1. Find 3/7 ÷ 3/7 = A) 1 B) Zero"
+    print("🧪 Testing OCR Utils...")
+    print(f"Cleaned: {clean_ocr_text(sample)}")
+    print("✅ Utils ready!")
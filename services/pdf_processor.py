@@ -1,38 +1,91 @@
-"""PDF Processor - Converts PDF pages to images"""
-
-from pdf2image import convert_from_path
-from typing import List
-import os
-from pathlib import Path
-
-class PDFProcessor:
-    def __init__(self, dpi: int = 300):
-        self.dpi = dpi
-    
-    def pdf_to_images(self, pdf_path: str, output_dir: str = "temp_images") -> List[str]:
-        """Convert PDF pages to images"""
-        Path(output_dir).mkdir(exist_ok=True)
-        
-        images = convert_from_path(
-            pdf_path, 
-            dpi=self.dpi,
-            output_folder=output_dir,
-            fmt="png",
-            paths_only=True
-        )
-        
-        print(f"✅ Converted {pdf_path} → {len(images)} images")
-        return images
-    
-    def cleanup_images(self, image_paths: List[str]):
-        """Clean up temporary images"""
-        for img_path in image_paths:
-            try:
-                os.remove(img_path)
-            except:
-                pass
-
-# Test function
-def test_pdf_processor():
-    print("🧪 Testing PDF Processor...")
-    print("✅ Ready! (Add test PDF to data/ to test conversion)")
+"""PDF Processor - Converts PDF pages to images"""
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from PIL import Image
+import numpy as np
+import os
+from pathlib import Path
+from src.ocr_tech.config import settings
+from .metrics import counter, histogram
+
+PAGES_RENDERED = counter("pdf_pages_rendered_total", "PDF pages rasterized by poppler")
+RENDER_SECONDS = histogram("pdf_render_seconds", "Seconds per poppler call (one run of up to batch_size pages)")
+
+class PDFProcessor:
+    def __init__(self, dpi: Optional[int] = None):
+        self.dpi = dpi or settings.PDF_DPI
+    
+    def pdf_to_images(self, pdf_path: str, output_dir: str = "temp_images") -> List[str]:
+        """Convert PDF pages to images"""
+        Path(output_dir).mkdir(exist_ok=True)
+        
+        images = convert_from_path(
+            pdf_path, 
+            dpi=self.dpi,
+            output_folder=output_dir,
+            fmt="png",
+            paths_only=True
+        )
+        
+        print(f"✅ Converted {pdf_path} → {len(images)} images")
+        return images
+    
+    def page_count(self, pdf_path: str) -> int:
+        """Number of pages in the PDF"""
+        return int(pdfinfo_from_path(pdf_path)["Pages"])
+    
+    def iter_pages(self, pdf_path: str, pages: Optional[Iterable[int]] = None,
+                   batch_size: int = 1) -> Iterator[Tuple[int, np.ndarray]]:
+        """Render pages in memory, yielding (page_number, BGR array)
+
+        At most `batch_size` consecutive pages are rasterized per poppler
+        call, so memory stays bounded no matter how long the PDF is.
+        """
+        if pages is None:
+            pages = range(1, self.page_count(pdf_path) + 1)
+        
+        for first_page, last_page in _page_runs(pages, batch_size):
+            with RENDER_SECONDS.time():
+                images = convert_from_path(
+                    pdf_path,
+                    dpi=self.dpi,
+                    first_page=first_page,
+                    last_page=last_page
+                )
+            PAGES_RENDERED.inc(len(images))
+            for page_number, image in enumerate(images, first_page):
+                yield page_number, to_bgr_array(image)
+            del images
+    
+    def cleanup_images(self, image_paths: List[str]):
+        """Clean up temporary images"""
+        for img_path in image_paths:
+            try:
+                os.remove(img_path)
+            except:
+                pass
+
+def to_bgr_array(image: Image.Image) -> np.ndarray:
+    """PIL page → contiguous BGR array, the layout PaddleOCR expects"""
+    rgb = np.asarray(image.convert("RGB"))
+    return np.ascontiguousarray(rgb[:, :, ::-1])
+
+def _page_runs(pages: Iterable[int], batch_size: int) -> Iterator[Tuple[int, int]]:
+    """Group page numbers into (first, last) runs of consecutive pages"""
+    batch_size = max(1, batch_size)
+    first = last = None
+    for page in pages:
+        if first is not None and page == last + 1 and page - first < batch_size:
+            last = page
+            continue
+        if first is not None:
+            yield first, last
+        first = last = page
+    if first is not None:
+        yield first, last
+
+# Test function
+def test_pdf_processor():
+    print("🧪 Testing PDF Processor...")
+    print("✅ Ready! (Add test PDF to data/ to test conversion)")
@@ -0,0 +1,344 @@
+"""Question index - finds questions already extracted elsewhere despite small OCR differences
+
+Each stored question is sketched as a 64-bit SimHash over character
+3-grams of its normalized text (question and options, labels removed).
+The SimHash is split into four 16-bit bands held in memory. A lookup
+probes each band's bucket and the 16 buckets one bit away from it, so
+two texts within 7 differing bits (a few OCR errors) always meet, and
+only the few entries in those buckets are compared. Candidates are confirmed on the
+Jaccard similarity of their 3-gram sets, on carrying exactly the same
+numbers and polarity words, and on options that pair up one to one with
+near-identical text: "3/7 ÷ 3/7" and "3/8 ÷ 3/8", "is divisible" and
+"is not divisible", or the same stem with other options are a few
+characters apart but must never match. Entries and their extraction
+results are persisted in SQLite.
+"""
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .metrics import counter
+
+logger = logging.getLogger(__name__)
+
+LOOKUPS = counter("question_index_lookups_total", "Near-duplicate question lookups by result (hit/miss)")
+
+BANDS = 4
+BAND_BITS = 16
+SHINGLE = 3
+
+# "12)", "Q12.", "Question 12:" at the start of a line
+_QUESTION_NUMBER = re.compile(r"^\s*(?:q(?:uestion)?\s*)?(\d{1,4})\s*[).:\-]\s*", re.I | re.M)
+# "A)", "(b)", "C." before an option
+_OPTION_LABEL = re.compile(r"(?:^|(?<=\s))\(?[a-dأبجد]\s*[).:]\s*", re.I | re.M)
+_NOISE = re.compile(r"[^\w\s+\-×÷=<>√%/^.,()]")
+_NUMBER = re.compile(r"\d+(?:[.,/]\d+)*")
+# Words that flip or change what a question asks for ("isn't" is "isn t" once normalized)
+_POLARITY = re.compile(
+    r"\b(?:not|no|never|none|neither|nor|without|except|cannot|\w+n t|incorrect|false|untrue|wrong|"
+    r"least|smallest|lowest|fewest|minimum|most|greatest|largest|highest|maximum|"
+    r"لا|ليس|ليست|غير|عدا|خطأ|أصغر|أكبر)\b"
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercase text without question numbers, option labels or stray symbols, single-spaced"""
+    text = _QUESTION_NUMBER.sub(" ", text)
+    text = _OPTION_LABEL.sub(" ", text)
+    return " ".join(_NOISE.sub(" ", text.lower()).split())
+
+
+def question_number(text: str) -> Optional[int]:
+    """The number the text starts with ("12) ...", "Q12. ..."), if any"""
+    match = _QUESTION_NUMBER.match(text)
+    return int(match.group(1)) if match else None
+
+
+def polarity(normalized: str) -> str:
+    """The polarity words of a normalized text, sorted"""
+    return " ".join(sorted(_POLARITY.findall(normalized)))
+
+
+def option_texts(text: str) -> str:
+    """Normalized texts of the labelled options, sorted and "|"-joined ("" without options)"""
+    options = (" ".join(_NOISE.sub(" ", part.lower()).split()) for part in _OPTION_LABEL.split(text)[1:])
+    return "|".join(sorted(option for option in options if option))
+
+
+def options_match(a: str, b: str, threshold: float = 0.8) -> bool:
+    """Whether two option_texts() pair up one to one, each pair with an edit ratio of at least threshold"""
+    left, right = a.split("|") if a else [], b.split("|") if b else []
+    if len(left) != len(right):
+        return False
+    for option in left:
+        best = max(right, key=lambda other: difflib.SequenceMatcher(None, option, other).ratio(), default=None)
+        if best is None or difflib.SequenceMatcher(None, option, best).ratio() < threshold:
+            return False
+        right.remove(best)
+    return True
+
+
+def shingles(normalized: str) -> Set[str]:
+    if len(normalized) <= SHINGLE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE] for i in range(len(normalized) - SHINGLE + 1)}
+
+
+def simhash(features: Set[str]) -> int:
+    """64-bit SimHash: bit i is set when most features' hashes have bit i set"""
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(feature.encode(), digest_size=8).digest() for feature in features),
+        dtype=np.uint8
+    ).reshape(-1, 8)
+    votes = np.unpackbits(hashes, axis=1).sum(axis=0, dtype=np.int32)
+    return int.from_bytes(np.packbits(votes * 2 > len(hashes)).tobytes(), "big")
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class QuestionIndex:
+    def __init__(self, path: str, threshold: float = 0.85, max_distance: int = 12, max_candidates: int = 32,
+                 option_threshold: float = 0.8):
+        """threshold: minimum 3-gram Jaccard similarity for a match
+
+        option_threshold: minimum edit ratio between paired option texts.
+        max_distance: SimHash bits a band candidate may differ by before it
+        is even compared; max_candidates: the nearest ones verified per lookup.
+        """
+        self.path = path
+        self.threshold = threshold
+        self.option_threshold = option_threshold
+        self.max_distance = max_distance
+        self.max_candidates = max_candidates
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Entry i: SQLite row id and SimHash; bands map a 16-bit value to the entries having it
+        self._ids = array("q")
+        self._hashes = array("Q")
+        self._bands: List[Dict[int, array]] = [{} for _ in range(BANDS)]
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            "id INTEGER PRIMARY KEY, simhash INTEGER NOT NULL, text TEXT NOT NULL, numbers TEXT NOT NULL, "
+            "result TEXT NOT NULL, created REAL NOT NULL, options TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(questions)")}
+        if "options" not in columns:
+            # Entries from before option texts were stored can't be verified: they never match
+            self._conn.execute("ALTER TABLE questions ADD COLUMN options TEXT")
+        self._conn.commit()
+
+        start = time.perf_counter()
+        for row_id, value in self._conn.execute("SELECT id, simhash FROM questions ORDER BY id"):
+            self._insert(row_id, value % (1 << 64))
+        if self._ids:
+            logger.info(f"Question index: {len(self._ids)} questions loaded in {time.perf_counter() - start:.2f}s")
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def lookup(self, text: str) -> Optional[Dict[str, Any]]:
+        """A copy of the stored result of the closest matching question, or None"""
+        normalized = normalize(text)
+        if not normalized:
+            return None
+        features = shingles(normalized)
+        numbers = " ".join(_NUMBER.findall(normalized))
+        words = polarity(normalized)
+        options = option_texts(text)
+        value = simhash(features)
+
+        with self._lock:
+            best = None
+            for _, row_id in self._candidates(value):
+                row = self._conn.execute(
+                    "SELECT text, numbers, result, options FROM questions WHERE id = ?", (row_id,)
+                ).fetchone()
+                if row is None or row[1] != numbers or row[3] is None or polarity(row[0]) != words:
+                    continue
+                if not options_match(options, row[3], self.option_threshold):
+                    continue
+                similarity = jaccard(features, shingles(row[0]))
+                if similarity >= self.threshold and (best is None or similarity > best[0]):
+                    best = (similarity, row_id, row[2])
+                    if similarity == 1.0:
+                        break
+            if best is None:
+                self.misses += 1
+                LOOKUPS.inc(result="miss")
+                return None
+            self.hits += 1
+            LOOKUPS.inc(result="hit")
+        logger.debug(f"Question index hit {best[1]} (similarity {best[0]:.2f})")
+        return json.loads(best[2])
+
+    def add(self, text: str, result: Dict[str, Any]) -> Optional[int]:
+        """Store an extraction result under the text it was extracted from; returns the entry id"""
+        ids = self.add_many([(text, result)])
+        return ids[0] if ids else None
+
+    def add_many(self, items: List[Tuple[str, Dict[str, Any]]]) -> List[int]:
+        """Store several (text, result) pairs in one transaction; texts that normalize to nothing are skipped"""
+        rows = []
+        for text, result in items:
+            normalized = normalize(text)
+            if normalized:
+                rows.append((simhash(shingles(normalized)), normalized, " ".join(_NUMBER.findall(normalized)),
+                             json.dumps(result, ensure_ascii=False), option_texts(text)))
+        ids = []
+        now = time.time()
+        with self._lock:
+            for value, normalized, numbers, result, options in rows:
+                cursor = self._conn.execute(
+                    "INSERT INTO questions (simhash, text, numbers, result, created, options) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (_signed(value), normalized, numbers, result, now, options)
+                )
+                self._insert(cursor.lastrowid, value)
+                ids.append(cursor.lastrowid)
+            self._conn.commit()
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "questions": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _insert(self, row_id: int, value: int):
+        """Add an entry to the in-memory arrays and band buckets (lock held, or during __init__)"""
+        index = len(self._ids)
+        self._ids.append(row_id)
+        self._hashes.append(value)
+        for bucket, band_value in zip(self._bands, _band_values(value)):
+            entries = bucket.get(band_value)
+            if entries is None:
+                entries = bucket[band_value] = array("q")
+            entries.append(index)
+
+    def _candidates(self, value: int) -> List[Tuple[int, int]]:
+        """(SimHash distance, row id) of entries sharing a band up to one bit, nearest first (lock held)"""
+        indexes = set()
+        for bucket, band_value in zip(self._bands, _band_values(value)):
+            indexes.update(bucket.get(band_value, ()))
+            for bit in range(BAND_BITS):
+                indexes.update(bucket.get(band_value ^ (1 << bit), ()))
+        nearest = []
+        for index in indexes:
+            distance = (self._hashes[index] ^ value).bit_count()
+            if distance <= self.max_distance:
+                nearest.append((distance, self._ids[index]))
+        nearest.sort()
+        return nearest[:self.max_candidates]
+
+
+def _band_values(value: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+
+def benchmark_question_index(count: int = 50_000, lookups: int = 2_000):
+    """Lookup latency with `count` stored questions, for exact, OCR-noisy and unseen queries"""
+    import tempfile
+
+    rng = random.Random(0)
+    words = ["find", "value", "of", "the", "sum", "product", "number", "which", "greatest", "smallest",
+             "equation", "triangle", "area", "angle", "fraction", "solve", "x", "if", "then", "is"]
+
+    def question(i):
+        body = " ".join(rng.choice(words) for _ in range(12))
+        return f"{i % 50 + 1}) {body} {i} ?\nA) {i + 1}  B) {i + 2}  C) {i + 3}  D) {i + 4}"
+
+    def ocr_noise(text):
+        chars = list(text)
+        for _ in range(2):
+            position = rng.randrange(len(chars))
+            if chars[position].isalpha():
+                chars[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        return "".join(chars)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = QuestionIndex(os.path.join(tmp, "index.sqlite"))
+        texts = [question(i) for i in range(count)]
+        start = time.perf_counter()
+        index.add_many([(text, {}) for text in texts])
+        print(f"Indexed {count} questions in {time.perf_counter() - start:.1f}s")
+
+        sample = rng.sample(texts, lookups)
+        for name, queries in (("exact", sample), ("ocr noise", [ocr_noise(text) for text in sample]),
+                              ("unseen", [question(count + i) for i in range(lookups)])):
+            start = time.perf_counter()
+            found = sum(index.lookup(query) is not None for query in queries)
+            elapsed = time.perf_counter() - start
+            print(f"{name:10s} {elapsed / len(queries) * 1e6:7.0f} µs/lookup  {found / len(queries):6.1%} matched")
+        index.close()
+
+
+def test_question_index():
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = QuestionIndex(os.path.join(tmp, "index.sqlite"))
+        text = "12) Find the value of 3/7 ÷ 3/7 in its simplest form =\nA) 1  B) Zero  C) -1  D) -9/4"
+        index.add(text, {"question_text": "Find 3/7 ÷ 3/7 =", "correct_answer": "A"})
+        assert index.lookup("5. Find the vaIue of 3/7 ÷ 3/7 in its simplest form =\n"
+                            "(a) 1 (b) Zero (c) -1 (d) -9/4")["correct_answer"] == "A"
+        assert index.lookup("12) Find the value of 3/8 ÷ 3/8 in its simplest form =\n"
+                            "A) 1  B) Zero  C) -1  D) -9/4") is None
+
+        # A negation or other options change the answer, however close the text
+        stem = "Which of the following numbers is divisible by both 3 and 4?"
+        index.add(f"3) {stem}\nA) 12  B) 18  C) 24  D) 30", {"question_text": stem, "correct_answer": "A"})
+        assert index.lookup(f"8) {stem}\nA) 12  B) 18  C) 24  D) 30")["correct_answer"] == "A"
+        assert index.lookup(f"3) {stem.replace('is', 'is not', 1)}\nA) 12  B) 18  C) 24  D) 30") is None
+        gas = "Which gas do plants take in from the air for photosynthesis?"
+        index.add(f"{gas}\nA) Oxygen  B) Carbon dioxide  C) Nitrogen  D) Helium", {"correct_answer": "B"})
+        assert index.lookup(f"{gas}\nA) Oxygen  B) Carbon dioxide  C) Nitrogen  D) Hydrogen") is None
+
+        # OCR noise in the stem and the options still matches; the same noise plus a flip doesn't
+        noisy = f"{gas}\n(a) Oxygen (b) Carbon dloxide (c) Nitrogen (d) HeIium"
+        assert index.lookup(noisy)["correct_answer"] == "B"
+        assert index.lookup(noisy.replace("take in", "not take in")) is None
+        noisy = f"9. {stem.replace('divisible', 'divisibIe')}\n(a) 12 (b) 18 (c) 24 (d) 30"
+        assert index.lookup(noisy)["correct_answer"] == "A"
+        assert index.lookup(noisy.replace("3 and 4", "3 and 5")) is None
+        index.close()
+        assert len(QuestionIndex(os.path.join(tmp, "index.sqlite"))) == 3
+    print("✅ Question index OK")
+
+
+if __name__ == "__main__":
+    test_question_index()
+    benchmark_question_index()
@@ -1,43 +1,399 @@
-"""Main processor: OCR + LLM pipeline"""
-
-from .ocr_service import OCRService
-from .llm_agents import MCQAgent
-from .pdf_processor import PDFProcessor
-from typing import List, Dict, Any
-import logging
-
-logger = logging.getLogger(__name__)
-
-class QuestionProcessor:
-    def __init__(self):
-        self.ocr = OCRService()
-        self.agent = MCQAgent()
-    
-    def process_pdf(self, pdf_path: str) -> List[Dict[str, Any]]:
-        """Full pipeline: PDF → Questions"""
-        questions = []
-        
-        # Step 1: OCR extraction
-        pdf_processor = PDFProcessor()
-        images = pdf_processor.pdf_to_images(pdf_path)
-        
-        for img_path in images:
-            # Step 2: Extract text
-            page_text = self.ocr.extract_full_page(img_path)
-            
-            # Step 3: Classify
-            classification = self.agent.classify_question(page_text)
-            
-            if classification.get("is_valid_mcq", False):
-                # Step 4: Extract
-                question = self.agent.extract_mcq(page_text)
-                questions.append(question)
-        
-        pdf_processor.cleanup_images(images)
-        logger.info(f"✅ Extracted {len(questions)} questions from {pdf_path}")
-        return questions
-
-def test_processor():
-    print("🧪 Testing Question Processor...")
-    processor = QuestionProcessor()
-    print("✅ Pipeline ready! (Add PDF to test)")
+"""Main processor: OCR + LLM pipeline"""
+
+from .checkpoint import CheckpointStore, document_hash
+from .llm_agents import MCQAgent
+from .noise_filter import RepeatedTextFilter
+from .ocr_blocks import PageBlocks
+from .question_index import QuestionIndex, question_number
+from .pdf_processor import PDFProcessor
+from .prompts import prompt_version
+from .text_layer import TextLayerExtractor
+from .ocr_utils import classify_page
+from .layout import segment_questions
+from .shared import get_ocr_service
+from .streaming import batched, prefetch, ordered_map
+from .tracing import bind, span, trace_job
+from src.ocr_tech.config import settings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class QuestionProcessor:
+    def __init__(self, llm_workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 use_text_layer: Optional[bool] = None, llm_mode: Optional[str] = None,
+                 use_prefilter: Optional[bool] = None, segment: Optional[bool] = None,
+                 checkpoint: Optional[bool] = None, strip_noise: Optional[bool] = None,
+                 question_index: Optional[bool] = None):
+        # Models are process-wide: more processors don't mean more PaddleOCR/Gemini instances
+        self.ocr = get_ocr_service()
+        self.agent = MCQAgent()
+        self.pdf = PDFProcessor()
+        self.text_layer = TextLayerExtractor(dpi=self.pdf.dpi, min_chars=settings.TEXT_LAYER_MIN_CHARS)
+        self.use_text_layer = settings.USE_TEXT_LAYER if use_text_layer is None else use_text_layer
+        # "two_pass": classify, then extract; "single_pass": one combined request per page
+        self.llm_mode = llm_mode or settings.LLM_PIPELINE_MODE
+        if self.llm_mode not in ("two_pass", "single_pass"):
+            raise ValueError(f"Unknown llm_mode: {self.llm_mode}")
+        self.use_prefilter = settings.USE_RULE_PREFILTER if use_prefilter is None else use_prefilter
+        self.segment = settings.SEGMENT_QUESTIONS if segment is None else segment
+        # Drop running headers/footers, page numbers and filler before the text reaches the LLM
+        self.strip_noise = settings.NOISE_FILTER if strip_noise is None else strip_noise
+        # Counters over the processor's lifetime; each document's own are in its run["stats"]
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self.llm_workers = llm_workers or settings.PIPELINE_LLM_WORKERS
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+        self.ocr_batch_pages = max(1, settings.OCR_BATCH_PAGES)
+        self._pools = {}
+        self._pool_lock = threading.Lock()
+        # Per-page results saved as they finish, so a failed or interrupted document resumes (opt-in)
+        checkpoint = settings.CHECKPOINT_ENABLED if checkpoint is None else checkpoint
+        self.checkpoints = CheckpointStore(
+            settings.CHECKPOINT_PATH, ttl_seconds=settings.CHECKPOINT_TTL_HOURS * 3600
+        ) if checkpoint else None
+        # Questions extracted before (any document), matched despite OCR differences: no LLM call for them (opt-in)
+        use_index = settings.QUESTION_INDEX_ENABLED if question_index is None else question_index
+        self.question_index = QuestionIndex(
+            settings.QUESTION_INDEX_PATH, threshold=settings.QUESTION_INDEX_THRESHOLD
+        ) if use_index else None
+
+    def process_pdf(self, pdf_path: str, streaming: Optional[bool] = None, trace_path: Optional[str] = None,
+                    pages: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """Full pipeline: PDF → Questions
+
+        pages: only these page numbers (1-based), e.g. range(1, 51).
+        trace_path: write a Chrome/Perfetto trace of this document there
+        (see services.tracing; TRACE_PROFILE / TRACE_MEMORY add profiles).
+
+        A page whose OCR fails is logged and left out; the rest of the
+        document still runs. With checkpointing on (checkpoint=True or
+        CHECKPOINT_ENABLED), any failed page is recorded instead and, once
+        the other pages are done, RuntimeError names the failed pages:
+        running the same PDF again redoes only those (and unfinished) pages.
+        Checkpoints not used for CHECKPOINT_TTL_HOURS are deleted.
+
+        Raises:
+            RuntimeError: checkpointing on and some pages failed
+        """
+        if streaming is None:
+            streaming = settings.PIPELINE_STREAMING
+
+        with trace_job(trace_path, name=pdf_path), span("document", path=pdf_path, streaming=streaming) as document:
+            results = list(self.stream_pdf(pdf_path, pages) if streaming else self._serial_pages(pdf_path, pages))
+            questions = [q for page in results for q in page["questions"]]
+            document.set(pages=len(results), questions=len(questions))
+
+        logger.info(f"✅ Extracted {len(questions)} questions from {pdf_path}")
+        timings = self.ocr.timing_report()
+        if timings:
+            logger.info("OCR ms/page: " + ", ".join(f"{step} {ms:.0f}" for step, ms in timings.items()))
+
+        failed = [page["page"] for page in results if page.get("error")]
+        if failed and self.checkpoints is None:
+            logger.warning(f"{len(failed)} of {len(results)} pages of {pdf_path} failed and were skipped: {failed}")
+        elif failed:
+            raise RuntimeError(f"{len(failed)} of {len(results)} pages of {pdf_path} failed ({failed}); "
+                               f"the other pages are checkpointed, run it again to retry these")
+        return questions
+
+    def prefilter_skip_rate(self, stats: Optional[Counter] = None) -> float:
+        """Share of prefiltered pages that never reached the LLM classifier (stats: one run's, default all)"""
+        stats = self.stats if stats is None else stats
+        decided = stats["prefilter_mcq"] + stats["prefilter_not_mcq"]
+        total = decided + stats["prefilter_uncertain"]
+        return decided / total if total else 0.0
+
+    def stream_pdf(self, pdf_path: str, pages: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        """Streaming pipeline: PDF → page results, in page order
+
+        Render, OCR and LLM stages run concurrently with bounded queues
+        between them, so a page moves on as soon as its stage is free.
+        Pages whose OCR failed, and with checkpointing on any failed page,
+        come back with an "error" key.
+        """
+        run = self._start_run(pdf_path, pages)
+
+        # Step 1: Read the text layer or render pages, on their own thread
+        rendered = prefetch(self._iter_pages(pdf_path, run), self.queue_size)
+
+        # Step 2: Extract text on a second thread, a batch of pages per OCR call
+        # (and several batches at once when OCR runs in a pool)
+        batches = batched(rendered, self.ocr_batch_pages)
+        ocr_pool = self._get_pool("ocr", self.ocr.concurrency)
+        ocr_stage = ordered_map(ocr_pool, partial(self._ocr_pages, run=run), batches, self.ocr.concurrency)
+        ocred = prefetch(chain.from_iterable(ocr_stage), self.queue_size)
+        noise = self._noise_filter()
+        if noise:
+            ocred = noise.stream(ocred)
+
+        # Steps 3-4: Classify + extract, several pages in flight
+        llm_pool = self._get_pool("llm", self.llm_workers)
+        yield from ordered_map(llm_pool, partial(self._llm_page, run=run), ocred, self.llm_workers * 2)
+        self._log_run(pdf_path, run, noise)
+
+    def _serial_pages(self, pdf_path: str, pages: Optional[Iterable[int]] = None) -> Iterator[Dict[str, Any]]:
+        """One page at a time, one stage at a time (the noise filter's warm-up pages excepted)"""
+        run = self._start_run(pdf_path, pages)
+        ocred = (self._ocr_page(page, run) for page in self._iter_pages(pdf_path, run))
+        noise = self._noise_filter()
+        if noise:
+            ocred = noise.stream(ocred)
+        for page in ocred:
+            yield self._llm_page(page, run)
+        self._log_run(pdf_path, run, noise)
+
+    def _noise_filter(self) -> Optional[RepeatedTextFilter]:
+        """A fresh filter per document: repeated text is learned from that document's pages only"""
+        if not self.strip_noise:
+            return None
+        # Same tolerance in inches whatever the DPI pages are rendered at
+        return RepeatedTextFilter(band_height=self.pdf.dpi / 5, warmup_pages=settings.NOISE_WARMUP_PAGES)
+
+    def _log_run(self, pdf_path: str, run: Dict[str, Any], noise: Optional[RepeatedTextFilter]):
+        """Per-document report once its last page is done"""
+        if noise:
+            report = noise.report()
+            self._count("noise_tokens_saved", report["tokens_saved"], run["stats"])
+            dropped = ", ".join(f"{count} {reason}" for reason, count in report["blocks_dropped"].items()) or "none"
+            logger.info(f"Noise filter on {pdf_path}: dropped {dropped} of {report['blocks']} blocks, "
+                        f"~{report['tokens_saved']} tokens saved per prompt type ({report['saved_ratio']:.0%} of page text)")
+        if self.use_prefilter:
+            logger.info(f"Rule prefilter skipped {self.prefilter_skip_rate(run['stats']):.0%} "
+                        f"of LLM classifications in {pdf_path}")
+
+    def _start_run(self, pdf_path: str, pages: Optional[Iterable[int]]) -> Dict[str, Any]:
+        """Pages to process, the document's own counters and, with checkpointing on, its hash and saved pages"""
+        page_count = self.pdf.page_count(pdf_path)
+        numbers = range(1, page_count + 1) if pages is None else sorted(set(pages))
+        run = {"pages": [n for n in numbers if 1 <= n <= page_count], "hash": None, "saved": {},
+               "stats": Counter()}
+        if self.checkpoints is None:
+            return run
+
+        run["hash"] = document_hash(pdf_path)
+        run["saved"] = self.checkpoints.begin(run["hash"], pdf_path, page_count, self._config())
+        done = {n for n in run["pages"] if run["saved"].get(n, {}).get("status") == "done"}
+        if done:
+            resume = next((n for n in run["pages"] if n not in done), None)
+            logger.info(f"Resuming {pdf_path}: {len(done)}/{len(run['pages'])} pages checkpointed"
+                        + (f", continuing at page {resume}" if resume else ", nothing left to do"))
+        return run
+
+    def _config(self) -> str:
+        """Settings that change page results: checkpoints made under other values are not reused"""
+        return json.dumps({
+            "llm_model": settings.LLM_MODEL,
+            "llm_mode": self.llm_mode,
+            "prefilter": self.use_prefilter,
+            "segment": self.segment,
+            "noise_filter": self.strip_noise,
+            "text_layer": self.use_text_layer,
+            "dpi": self.pdf.dpi,
+            "min_confidence": settings.MIN_CONFIDENCE_THRESHOLD,
+            "ocr_lang": self.ocr.lang,
+            "angle_cls": self.ocr.use_angle_cls,
+            "prompts": prompt_version(),
+            "preprocess": self.ocr.preprocessor.config() if self.ocr.preprocessor else None
+        }, sort_keys=True)
+
+    def _iter_pages(self, pdf_path: str, run: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Render stage: checkpointed results or text, embedded text where usable, page images otherwise"""
+        saved = run["saved"]
+        # Pages with saved blocks (OCR done, extraction missing or failed) skip straight to the LLM stage
+        needed = [n for n in run["pages"]
+                  if n not in saved or (saved[n]["status"] != "done" and saved[n]["blocks"] is None)]
+        with span("text_layer", pages=len(needed)) as text_span:
+            text_pages = self.text_layer.extract_pages(pdf_path) if self.use_text_layer and needed else {}
+            text_span.set(text_pages=sum(blocks is not None for blocks in text_pages.values()))
+
+        scanned = [n for n in needed if text_pages.get(n) is None]
+        images = self.pdf.iter_pages(pdf_path, pages=scanned)
+
+        for page_number in run["pages"]:
+            state = saved.get(page_number)
+            blocks = text_pages.get(page_number)
+            if state is not None and state["status"] == "done":
+                # Blocks come along only for the noise filter to learn from; the result is reused as is
+                yield {"page": page_number, "source": state["result"]["source"], "result": state["result"],
+                       "blocks": state["blocks"]}
+            elif state is not None and state["blocks"] is not None:
+                yield {"page": page_number, "blocks": state["blocks"], "source": state["source"]}
+            elif blocks is not None:
+                if run["hash"] is not None:
+                    self.checkpoints.save_blocks(run["hash"], page_number, "text_layer", blocks)
+                yield {"page": page_number, "blocks": blocks, "source": "text_layer"}
+            else:
+                with span("render", page=page_number):
+                    _, image = next(images)
+                yield {"page": page_number, "image": image, "source": "ocr"}
+
+    def _ocr_page(self, page: Dict[str, Any], run: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """OCR stage: rendered page → text blocks (text-layer pages pass straight through)"""
+        return self._ocr_pages([page], run)[0]
+
+    def _ocr_pages(self, pages: List[Dict[str, Any]], run: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """OCR stage for a batch of pages, recognizing all their lines together"""
+        scanned = [page for page in pages if "image" in page]
+        if not scanned:
+            return pages
+        checkpoint = run["hash"] if run else None
+        with span("ocr", pages=[page["page"] for page in scanned]) as ocr_span:
+            # A failed page gets an "error" instead of blocks: it must not pass for an empty page
+            error = "OCR failed (see log)"
+            try:
+                if len(scanned) == 1:
+                    results = [self.ocr.extract_page_blocks(scanned[0]["image"])]
+                else:
+                    results = self.ocr.extract_batch_blocks([page["image"] for page in scanned])
+            except Exception as e:
+                results, error = [None] * len(scanned), f"OCR failed: {type(e).__name__}: {e}"
+            for page, blocks in zip(scanned, results):
+                del page["image"]
+                if blocks is None:
+                    page["error"] = error
+                else:
+                    page["blocks"] = blocks
+            ocr_span.set(blocks=sum(len(page["blocks"]) for page in scanned if "blocks" in page),
+                         failed=sum("error" in page for page in scanned))
+
+        if checkpoint is not None:
+            for page in scanned:
+                if "error" not in page:
+                    self.checkpoints.save_blocks(checkpoint, page["page"], page["source"], page["blocks"])
+        return pages
+
+    def _llm_page(self, page: Dict[str, Any], run: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """LLM stage, with checkpointing: saved results are reused, new ones saved, failures recorded"""
+        if "result" in page:
+            return page["result"]
+        stats = run["stats"] if run else None
+        checkpoint = run["hash"] if run else None
+        error = page.get("error")
+        if error is None and checkpoint is None:
+            return self._analyze_page(page, stats)
+
+        if error is None:
+            try:
+                result = self._analyze_page(page, stats)
+                self.checkpoints.save_result(checkpoint, page["page"], result)
+                return result
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        logger.error(f"Page {page['page']} failed: {error}")
+        if checkpoint is not None:
+            self.checkpoints.save_failure(checkpoint, page["page"], error)
+        return {"page": page["page"], "source": page["source"], "classification": None,
+                "questions": [], "error": error}
+
+    def _analyze_page(self, page: Dict[str, Any], stats: Optional[Counter] = None) -> Dict[str, Any]:
+        """Classify the page text and extract its question(s)
+
+        Pages with several numbered questions are split by layout and each
+        question chunk goes to the LLM on its own, in parallel.
+        """
+        with span("llm_page", page=page["page"], source=page["source"], blocks=len(page["blocks"])) as page_span:
+            chunks = segment_questions(page["blocks"]) if self.segment else []
+            if chunks:
+                pool = self._get_pool("chunk", self.llm_workers)
+                results = list(pool.map(bind(partial(self._analyze_chunk, stats=stats)), chunks))
+                questions = [question for _, chunk_questions in results for question in chunk_questions]
+                classification = {"is_valid_mcq": bool(questions), "source": "layout", "segments": len(chunks)}
+            else:
+                page_text = self.ocr.blocks_to_text(page["blocks"])
+                classification, questions = self._analyze_text(page_text, page["blocks"], stats)
+            page_span.set(segments=len(chunks), questions=len(questions))
+
+        return {
+            "page": page["page"],
+            "source": page["source"],
+            "classification": classification,
+            "questions": questions
+        }
+
+    def _analyze_text(self, text: str, blocks: Optional[PageBlocks] = None,
+                      stats: Optional[Counter] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Classify text (rules first, LLM only when unsure) and extract its question
+
+        A question already in the index is reused without any LLM call.
+        """
+        verdict = None
+        if self.use_prefilter:
+            verdict = classify_page(text, blocks)
+            self._count(f"prefilter_{verdict['verdict']}", stats=stats)
+            if verdict["verdict"] == "not_mcq":
+                return {"is_valid_mcq": False, "source": "rules", "reasons": verdict["reasons"]}, []
+
+        known = self._known_question(text, stats)
+        if known is not None:
+            return {"is_valid_mcq": True, "source": "index"}, [known]
+
+        if verdict is not None and verdict["verdict"] == "mcq":
+            classification = {"is_valid_mcq": True, "source": "rules", "reasons": verdict["reasons"]}
+            return classification, [self._extract(text)]
+
+        if self.llm_mode == "single_pass":
+            result = self.agent.classify_and_extract(text)
+            if result["question"]:
+                self._remember(text, result["question"])
+            return result["classification"], [result["question"]] if result["question"] else []
+
+        classification = self.agent.classify_question(text)
+        if classification.get("is_valid_mcq", False):
+            return classification, [self._extract(text)]
+        return classification, []
+
+    def _extract(self, text: str) -> Dict[str, Any]:
+        question = self.agent.extract_mcq(text)
+        self._remember(text, question)
+        return question
+
+    def _known_question(self, text: str, stats: Optional[Counter] = None) -> Optional[Dict[str, Any]]:
+        """The stored extraction of a near-identical question, renumbered to this text's number"""
+        if self.question_index is None:
+            return None
+        question = self.question_index.lookup(text)
+        if question is not None:
+            self._count("index_hits", stats=stats)
+            number = question_number(text)
+            if number is not None:
+                question["question_number"] = number
+        return question
+
+    def _remember(self, text: str, question: Dict[str, Any]):
+        # Only complete extractions: the parse-failure fallback has no options
+        if self.question_index is not None and question.get("question_text") and question.get("options"):
+            self.question_index.add(text, question)
+
+    def _analyze_chunk(self, chunk: Dict[str, Any], stats: Optional[Counter] = None
+                       ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """One question region of a segmented page"""
+        classification, questions = self._analyze_text(chunk["text"], chunk["blocks"], stats)
+        for question in questions:
+            question["region"] = chunk["region"]
+        return classification, questions
+
+    def _count(self, name: str, amount: int = 1, stats: Optional[Counter] = None):
+        """Add to the lifetime counters and, when given, to one run's"""
+        with self._stats_lock:
+            self.stats[name] += amount
+            if stats is not None:
+                stats[name] += amount
+
+    def _get_pool(self, name: str, workers: int) -> ThreadPoolExecutor:
+        """Per-stage thread pools, created on first use and shared across documents"""
+        with self._pool_lock:
+            if name not in self._pools:
+                self._pools[name] = ThreadPoolExecutor(workers, thread_name_prefix=name)
+            return self._pools[name]
+
+def test_processor():
+    print("🧪 Testing Question Processor...")
+    processor = QuestionProcessor()
+    print("✅ Pipeline ready! (Add PDF to test)")
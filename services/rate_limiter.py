@@ -0,0 +1,110 @@
+"""Client-side rate limiting and retry backoff for LLM calls"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """Refills rate_per_minute units per minute, holding at most `capacity` (default: one minute's worth)"""
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units now; returns how long the caller must wait before using them"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            # A negative balance is debt the caller pays off by waiting
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, amount: float = 1):
+        delay = self.reserve(amount)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, amount: float = 1):
+        delay = self.reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class ConcurrencyLimit:
+    def __init__(self, limit: int, poll_seconds: float = 0.005, max_poll_seconds: float = 0.05):
+        """At most `limit` holders at once, shared by every thread and event loop
+
+        asyncio primitives belong to one loop, so waiting coroutines poll a
+        thread semaphore instead, backing off from poll_seconds to
+        max_poll_seconds.
+        """
+        self.limit = limit
+        self.poll_seconds = poll_seconds
+        self.max_poll_seconds = max_poll_seconds
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        with self._semaphore:
+            yield
+
+    @asynccontextmanager
+    async def hold_async(self) -> AsyncIterator[None]:
+        delay = self.poll_seconds
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(self.max_poll_seconds, delay * 2)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+def backoff_delay(attempt: int, base: float, cap: float, error: Optional[BaseException] = None) -> float:
+    """Exponential backoff with full jitter; a server retry-after hint takes precedence"""
+    hint = retry_after(error) if error is not None else None
+    if hint is not None:
+        return min(cap, hint) + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_RETRY_PATTERNS = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.IGNORECASE),
+)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds the server asked us to wait, if the error carries that hint"""
+    value = getattr(error, "retry_after", None)
+    if value is not None:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if "Retry-After" in headers:
+        try:
+            return float(headers["Retry-After"])
+        except ValueError:
+            pass
+
+    message = str(error)
+    for pattern in _RETRY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
@@ -0,0 +1,69 @@
+"""Process-wide model instances - one OCR engine and one Gemini client, created on first use"""
+
+import logging
+import threading
+import time
+from typing import Dict
+
+import numpy as np
+
+from src.ocr_tech.config import settings
+
+logger = logging.getLogger(__name__)
+
+_ocr_service = None
+_ocr_lock = threading.Lock()
+_llm_client = None
+_llm_lock = threading.Lock()
+
+
+def get_ocr_service():
+    """The shared OCRService (PaddleOCR or its worker pool), loaded on first call"""
+    global _ocr_service
+    with _ocr_lock:
+        if _ocr_service is None:
+            from .ocr_service import OCRService
+            start = time.perf_counter()
+            _ocr_service = OCRService()
+            logger.info(f"OCR engine loaded in {time.perf_counter() - start:.2f}s")
+        return _ocr_service
+
+
+def get_llm_client():
+    """The shared GeminiClient; fails here, not at import, when GEMINI_API_KEY is missing"""
+    global _llm_client
+    with _llm_lock:
+        if _llm_client is None:
+            from .gemini_client import GeminiClient
+            _llm_client = GeminiClient(settings.LLM_MODEL)
+        return _llm_client
+
+
+def warmup(ocr: bool = True, llm: bool = True) -> Dict[str, float]:
+    """Load the shared models and run one dummy OCR inference so the first real page is not slow
+
+    Returns seconds per step. The LLM is only instantiated: a dummy
+    request would spend quota.
+    """
+    timings = {}
+    if ocr:
+        start = time.perf_counter()
+        service = get_ocr_service()
+        timings["ocr_load"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        image = np.full((64, 256, 3), 255, dtype=np.uint8)
+        image[24:40, 16:240] = 0
+        if service.pool:
+            # One page per worker, so every process has its model loaded
+            list(service.pool.map([image] * service.pool.workers))
+        else:
+            service.ocr_lines(image)
+        timings["ocr_warmup"] = time.perf_counter() - start
+    if llm:
+        start = time.perf_counter()
+        get_llm_client()
+        timings["llm_load"] = time.perf_counter() - start
+
+    logger.info("Warmup: " + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
+    return timings
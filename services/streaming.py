@@ -0,0 +1,96 @@
+"""Bounded producer/consumer helpers for the streaming pipeline"""
+
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List
+import contextvars
+import queue
+import threading
+
+
+class _Failure:
+    """Carries a producer-side exception across the queue"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_END = object()
+
+
+def _put(buffer: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Put into a bounded queue, giving up once the consumer has gone away"""
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(iterable: Iterable, size: int) -> Iterator:
+    """Drive `iterable` on a background thread, staying at most `size` items ahead of the consumer"""
+    buffer = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(buffer, item, stop):
+                    return
+            _put(buffer, _END, stop)
+        except BaseException as e:
+            _put(buffer, _Failure(e), stop)
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                close()
+
+    # The producer runs in the consumer's context (active trace, current span)
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(produce,), name="prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Group items into lists of up to `size`, without reading ahead further"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ordered_map(executor: Executor, fn: Callable, items: Iterable, max_inflight: int) -> Iterator:
+    """Lazy executor.map: at most `max_inflight` calls run at once and results come back in input order"""
+    inflight = deque()
+    max_inflight = max(1, max_inflight)
+    # Thread workers run fn in the caller's context; a context can't be sent to another process
+    in_context = not isinstance(executor, ProcessPoolExecutor)
+    try:
+        for item in items:
+            if in_context:
+                inflight.append(executor.submit(contextvars.copy_context().run, fn, item))
+            else:
+                inflight.append(executor.submit(fn, item))
+            while inflight and (len(inflight) >= max_inflight or inflight[0].done()):
+                yield inflight.popleft().result()
+        while inflight:
+            yield inflight.popleft().result()
+    finally:
+        for future in inflight:
+            future.cancel()
@@ -0,0 +1,149 @@
+"""Text Layer - Reads embedded text from born-digital PDFs via poppler"""
+
+import logging
+import subprocess
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional
+
+import numpy as np
+
+from .ocr_blocks import PageBlocks
+
+logger = logging.getLogger(__name__)
+
+# Characters we expect in real exam text; anything else counts as extraction garbage
+_EXPECTED_SYMBOLS = set(" \t\n.,;:!?()[]{}'\"-+*/=<>%&$#@^_|~`÷×√²³≈≠≤≥πθ°…–—’“”")
+
+
+class TextLayerExtractor:
+    def __init__(self, dpi: int = 300, min_chars: int = 40, min_clean_ratio: float = 0.9,
+                 min_coverage: float = 0.02, min_image_ratio: float = 0.5):
+        """A page's text layer is used when it holds min_chars mostly clean characters
+
+        On a scan (a raster image over min_image_ratio of the page area)
+        its lines must also cover min_coverage of the page: a scanned page
+        with only a digital header or footer goes to OCR.
+        """
+        # Blocks are scaled from PDF points to rendered pixels so they line up with OCR output
+        self.scale = dpi / 72.0
+        self.min_chars = min_chars
+        self.min_clean_ratio = min_clean_ratio
+        self.min_coverage = min_coverage
+        self.min_image_ratio = min_image_ratio
+
+    def extract_pages(self, pdf_path: str, first_page: Optional[int] = None,
+                      last_page: Optional[int] = None) -> Dict[int, Optional[PageBlocks]]:
+        """Text blocks per page number; None where the text layer is missing or unusable"""
+        cmd = ["pdftotext", "-bbox-layout", "-enc", "UTF-8"]
+        if first_page:
+            cmd += ["-f", str(first_page)]
+        if last_page:
+            cmd += ["-l", str(last_page)]
+        cmd += [pdf_path, "-"]
+
+        try:
+            output = subprocess.run(cmd, capture_output=True, check=True).stdout
+            root = ET.fromstring(output)
+        except (OSError, subprocess.CalledProcessError, ET.ParseError) as e:
+            logger.warning(f"Text layer unavailable for {pdf_path}: {e}")
+            return {}
+
+        scans = self._image_areas(pdf_path, first_page, last_page)
+        pages = {}
+        for page_number, page in enumerate(_children(root, "page"), first_page or 1):
+            blocks = self._page_blocks(page)
+            area = float(page.get("width", 0)) * float(page.get("height", 0))
+            scanned = None if scans is None else area > 0 and scans.get(page_number, 0) >= self.min_image_ratio * area
+            pages[page_number] = blocks if self.is_usable(blocks, area, scanned) else None
+
+        usable = sum(1 for blocks in pages.values() if blocks is not None)
+        logger.info(f"Text layer usable on {usable}/{len(pages)} pages of {pdf_path}")
+        return pages
+
+    def is_usable(self, blocks: PageBlocks, page_area: float = 0.0, scanned: Optional[bool] = False) -> bool:
+        """Enough text, mostly characters a real page would contain and, on a scan, covering the page
+
+        page_area is in PDF points²; scanned is None when it is unknown
+        (pdfimages missing), which counts as a scan.
+        """
+        text = "".join(blocks.texts)
+        if len(text) < self.min_chars or "(cid:" in text:
+            return False
+        clean = sum(1 for ch in text if ch.isalnum() or ch in _EXPECTED_SYMBOLS)
+        if clean / len(text) < self.min_clean_ratio:
+            return False
+        return scanned is False or not page_area or self.coverage(blocks, page_area) >= self.min_coverage
+
+    def coverage(self, blocks: PageBlocks, page_area: float) -> float:
+        """Share of the page area (PDF points²) covered by the blocks' boxes"""
+        bounds = blocks.bounds / self.scale
+        return float(((bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])).sum()) / page_area
+
+    def _image_areas(self, pdf_path: str, first_page: Optional[int] = None,
+                       last_page: Optional[int] = None) -> Optional[Dict[int, float]]:
+        """Area (PDF points²) of the largest raster image per page number, None without pdfimages"""
+        cmd = ["pdfimages", "-list"]
+        if first_page:
+            cmd += ["-f", str(first_page)]
+        if last_page:
+            cmd += ["-l", str(last_page)]
+        cmd += [pdf_path]
+
+        try:
+            output = subprocess.run(cmd, capture_output=True, check=True, text=True).stdout
+        except (OSError, subprocess.CalledProcessError) as e:
+            logger.warning(f"Image list unavailable for {pdf_path}: {e}")
+            return None
+
+        images = {}
+        # page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+        for line in output.splitlines()[2:]:
+            fields = line.split()
+            if len(fields) < 14 or fields[2] != "image":
+                continue
+            try:
+                page, width, height = int(fields[0]), int(fields[3]), int(fields[4])
+                x_ppi, y_ppi = float(fields[12]), float(fields[13])
+            except ValueError:
+                continue
+            if x_ppi > 0 and y_ppi > 0:
+                area = (width / x_ppi * 72) * (height / y_ppi * 72)
+                images[page] = max(images.get(page, 0.0), area)
+        return images
+
+    def _page_blocks(self, page: ET.Element) -> PageBlocks:
+        """One block per text line, like OCRService.extract_page_blocks"""
+        boxes, texts = [], []
+        for line in _children(page, "line"):
+            words = [word.text or "" for word in _children(line, "word")]
+            text = " ".join(word for word in words if word)
+            if not text:
+                continue
+
+            x_min, y_min, x_max, y_max = (
+                float(line.get(key)) * self.scale for key in ("xMin", "yMin", "xMax", "yMax")
+            )
+            boxes.append([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]])
+            texts.append(text)
+        if not texts:
+            return PageBlocks.empty("text_layer")
+        return PageBlocks(np.array(boxes), np.ones(len(texts)), texts, "text_layer")
+
+
+def _children(element: ET.Element, name: str):
+    """Descendants with the given local tag name (pdftotext output is namespaced XHTML)"""
+    return (child for child in element.iter() if child.tag.rsplit("}", 1)[-1] == name)
+
+
+# Test function
+def test_text_layer():
+    print("🧪 Testing Text Layer...")
+    extractor = TextLayerExtractor()
+    box = np.array([[50, 760], [300, 760], [300, 770], [50, 770]]) * extractor.scale
+    footer = PageBlocks([box], [1.0],
+                        ["Bakeer Academy - Mathematics worksheet 12"], "text_layer")
+    # A digital footer alone: fine on a born-digital page, not on a scan (or when that is unknown)
+    assert extractor.is_usable(footer, 612 * 792, scanned=False)
+    assert not extractor.is_usable(footer, 612 * 792, scanned=True)
+    assert not extractor.is_usable(footer, 612 * 792, scanned=None)
+    print(f"✅ Ready! (scale {extractor.scale:.2f} px/pt)")
@@ -0,0 +1,275 @@
+"""Per-job tracing - a span tree written as Chrome/Perfetto trace JSON
+
+Tracing is opt-in and scoped with contextvars: only code running under
+trace_job() records spans, everywhere else span() returns a shared no-op.
+Worker threads see the active trace when started through bind() or the
+streaming helpers, which copy the caller's context.
+
+    with trace_job("job.trace.json", name=pdf_path):
+        with span("ocr", page=3) as s:
+            s.set(blocks=len(blocks))
+
+Open the file in ui.perfetto.dev or chrome://tracing.
+"""
+
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from src.ocr_tech.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Top-level spans of each pipeline stage: the ones profiled / snapshotted when asked
+DEFAULT_STAGES = ("render", "ocr", "llm_page", "docx")
+
+_tracer: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar("tracer", default=None)
+_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span", default=None)
+
+
+class _NoopSpan:
+    """Returned by span() outside a trace: every call is a no-op"""
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "id", "parent", "start", "_token", "_profile", "_memory")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.id = None
+        self.parent = None
+        self.start = 0.0
+        self._token = None
+        self._profile = None
+        self._memory = 0
+
+    def set(self, **attrs):
+        """Add attributes known only once the work is done (blocks found, response size...)"""
+        self.args.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _span.get()
+        self.parent = parent.id if parent is not None else None
+        self._token = _span.set(self)
+        self.tracer._enter(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc is not None:
+            self.args["error"] = repr(exc)
+        _span.reset(self._token)
+        self.tracer._exit(self, end)
+
+
+class Tracer:
+    def __init__(self, name: str = "job", profile: bool = False, memory: bool = False,
+                 stages: Iterable[str] = DEFAULT_STAGES):
+        """Collects spans for one job
+
+        profile=True runs cProfile inside stage spans (one at a time: the
+        profiler is per thread) and aggregates the stats per stage.
+        memory=True tracks tracemalloc: every span gets its net allocation
+        and each stage keeps the snapshot taken at the end of its last span.
+        """
+        self.name = name
+        self.profile = profile
+        self.memory = memory
+        self.stages = frozenset(stages)
+        self.events: List[Dict[str, Any]] = []
+        self.profiles: Dict[str, pstats.Stats] = {}
+        self.snapshots: Dict[str, tracemalloc.Snapshot] = {}
+        self._threads: Dict[int, str] = {}
+        self._next_id = 0
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+        self._owns_tracemalloc = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    def stop(self):
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def span(self, name: str, **attrs) -> Span:
+        return Span(self, name, attrs)
+
+    def _enter(self, span: Span):
+        with self._lock:
+            self._next_id += 1
+            span.id = self._next_id
+        if self.memory:
+            span._memory = tracemalloc.get_traced_memory()[0]
+        if self.profile and span.name in self.stages and self._profiling.acquire(blocking=False):
+            span._profile = cProfile.Profile()
+            span._profile.enable()
+
+    def _exit(self, span: Span, end: float):
+        if span._profile is not None:
+            span._profile.disable()
+            self._profiling.release()
+        args = dict(span.args, span_id=span.id)
+        if span.parent is not None:
+            args["parent_id"] = span.parent
+        if self.memory:
+            args["alloc_kb"] = round((tracemalloc.get_traced_memory()[0] - span._memory) / 1024, 1)
+        snapshot = tracemalloc.take_snapshot() if self.memory and span.name in self.stages else None
+
+        thread = threading.current_thread()
+        event = {
+            "name": span.name,
+            "cat": span.name.split(".")[0],
+            "ph": "X",
+            "ts": (span.start - self._origin) * 1e6,
+            "dur": (end - span.start) * 1e6,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+            "args": args
+        }
+        with self._lock:
+            self.events.append(event)
+            self._threads[thread.ident] = thread.name
+            if span._profile is not None:
+                stats = self.profiles.get(span.name)
+                if stats is None:
+                    self.profiles[span.name] = pstats.Stats(span._profile)
+                else:
+                    stats.add(span._profile)
+            if snapshot is not None:
+                self.snapshots[span.name] = snapshot
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Trace Event Format: complete ("X") events plus process/thread name metadata"""
+        pid = os.getpid()
+        with self._lock:
+            metadata = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.name}}]
+            metadata += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                         for tid, name in self._threads.items()]
+            events = sorted(self.events, key=lambda event: event["ts"])
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def write(self, path: str) -> List[str]:
+        """Write the trace to path, plus <path>.<stage>.prof / .tracemalloc files; returns all paths"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.to_chrome(), f)
+        written = [path]
+        base = path[:-len(".json")] if path.endswith(".json") else path
+        for stage, stats in self.profiles.items():
+            stats.dump_stats(f"{base}.{stage}.prof")
+            written.append(f"{base}.{stage}.prof")
+        for stage, snapshot in self.snapshots.items():
+            snapshot.dump(f"{base}.{stage}.tracemalloc")
+            written.append(f"{base}.{stage}.tracemalloc")
+        return written
+
+
+@contextmanager
+def trace_job(path: Optional[str], name: str = "job", profile: Optional[bool] = None,
+              memory: Optional[bool] = None) -> Iterator[Optional[Tracer]]:
+    """Trace everything run in this context (and in bound threads), written to path on exit
+
+    path=None disables tracing and yields None. Inside an active trace a
+    nested trace_job just joins it, so callers can trace wider than the
+    pipeline (e.g. including the DOCX export).
+    """
+    if path is None or _tracer.get() is not None:
+        yield _tracer.get()
+        return
+
+    tracer = Tracer(
+        name,
+        profile=settings.TRACE_PROFILE if profile is None else profile,
+        memory=settings.TRACE_MEMORY if memory is None else memory
+    )
+    tracer.start()
+    token = _tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _tracer.reset(token)
+        tracer.stop()
+        try:
+            files = tracer.write(path)
+            logger.info(f"Trace of {name} written to {', '.join(files)}")
+        except OSError as e:
+            logger.warning(f"Could not write trace to {path}: {e}")
+
+
+def span(name: str, **attrs):
+    """A span in the active trace, or a shared no-op when nothing is being traced"""
+    tracer = _tracer.get()
+    if tracer is None:
+        return _NOOP_SPAN
+    return Span(tracer, name, attrs)
+
+
+def current_span():
+    """The innermost open span (no-op outside a trace), e.g. to set(cached=True) from deep code"""
+    return _span.get() or _NOOP_SPAN
+
+
+def bind(fn: Callable) -> Callable:
+    """fn running in the caller's context (active trace and parent span) on whichever thread calls it"""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # A context can only be entered by one thread at a time: each call gets its own copy
+        return context.copy().run(fn, *args, **kwargs)
+
+    return run
+
+
+def test_tracing():
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+
+    def ocr(page):
+        with span("ocr", page=page):
+            time.sleep(0.001)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "trace.json")
+        with trace_job(path, name="test", profile=True, memory=True):
+            with span("document") as document:
+                with ThreadPoolExecutor(2) as pool:
+                    list(pool.map(bind(ocr), range(4)))
+                document.set(pages=4)
+        trace = json.load(open(path))
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert len(spans) == 5
+    assert all(event["args"].get("parent_id") == 1 for event in spans if event["name"] == "ocr")
+    assert span("outside") is _NOOP_SPAN
+    print("✅ Tracing OK")
+
+
+if __name__ == "__main__":
+    test_tracing()
@@ -1,14 +1,63 @@
-from pydantic_settings import BaseSettings
-import os
-
-class Settings(BaseSettings):
-    GEMINI_API_KEY: str
-    DEBUG: bool = True
-    OCR_LANGUAGE: str = "en"
-    LLM_MODEL: str = "gemini-2.0-flash"
-    MIN_CONFIDENCE_THRESHOLD: float = 0.85
-    
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
+from pydantic_settings import BaseSettings
+import os
+
+class Settings(BaseSettings):
+    GEMINI_API_KEY: str = ""
+    DEBUG: bool = True
+    OCR_LANGUAGE: str = "en"
+    LLM_MODEL: str = "gemini-2.0-flash"
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = ".cache/llm_cache.sqlite"
+    LLM_CACHE_MAX_MB: int = 256
+    LLM_CACHE_TTL_HOURS: float = 24 * 30
+    LLM_MAX_ATTEMPTS: int = 3
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_BACKOFF_BASE_SECONDS: float = 1.0
+    LLM_BACKOFF_MAX_SECONDS: float = 60.0
+    LLM_REQUESTS_PER_MINUTE: int = 0
+    LLM_TOKENS_PER_MINUTE: int = 0
+    MIN_CONFIDENCE_THRESHOLD: float = 0.85
+    OCR_POOL_SIZE: int = 0
+    OCR_CPU_THREADS: int = 0
+    OCR_USE_ANGLE_CLS: bool = True
+    OCR_REC_BATCH_SIZE: int = 32
+    OCR_BATCH_PAGES: int = 1
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_PATH: str = ".cache/ocr_cache.sqlite"
+    OCR_CACHE_MAX_MB: int = 1024
+    OCR_PREPROCESS: bool = False
+    OCR_TARGET_LONG_EDGE: int = 2000
+    OCR_DESKEW: bool = False
+    PDF_DPI: int = 300
+    PIPELINE_STREAMING: bool = False
+    PIPELINE_QUEUE_SIZE: int = 4
+    PIPELINE_LLM_WORKERS: int = 4
+    LLM_PIPELINE_MODE: str = "two_pass"
+    USE_RULE_PREFILTER: bool = True
+    SEGMENT_QUESTIONS: bool = True
+    NOISE_FILTER: bool = True
+    NOISE_WARMUP_PAGES: int = 6
+    USE_TEXT_LAYER: bool = True
+    TEXT_LAYER_MIN_CHARS: int = 40
+    JOB_WORKERS: int = 2
+    ARTIFACT_TTL_MINUTES: float = 60
+    ARTIFACT_MAX_MB: int = 512
+    ARTIFACT_SPOOL_MB: int = 8
+    ARTIFACT_SPOOL_DIR: str = ""
+    DOCX_EXPORT_WORKERS: int = 0
+    PRELOAD_MODELS: bool = True
+    METRICS_ENABLED: bool = True
+    TRACE_DIR: str = ""
+    TRACE_PROFILE: bool = False
+    TRACE_MEMORY: bool = False
+    CHECKPOINT_ENABLED: bool = False
+    CHECKPOINT_PATH: str = ".cache/checkpoints.sqlite"
+    CHECKPOINT_TTL_HOURS: float = 72
+    QUESTION_INDEX_ENABLED: bool = False
+    QUESTION_INDEX_PATH: str = ".cache/question_index.sqlite"
+    QUESTION_INDEX_THRESHOLD: float = 0.85
+    
+    class Config:
+        env_file = ".env"
+
+settings = Settings()